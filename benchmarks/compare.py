@@ -0,0 +1,61 @@
+"""Compare two benchmark result files written with --json.
+
+Prints every numeric result side by side with its relative change, so a
+run on a branch can be checked against one on the base commit:
+
+    python benchmarks/detection.py --json base.json
+    python benchmarks/detection.py --json branch.json
+    python benchmarks/compare.py base.json branch.json
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(value, prefix=''):
+    """{'a.b.c': number} for every numeric leaf of a nested dict."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f'{prefix}.{key}' if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('new')
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    if base['suite'] != new['suite']:
+        sys.exit(f"Cannot compare a {base['suite']} run with a {new['suite']} run")
+    for label, run in (('base', base), ('new', new)):
+        env = run['environment']
+        commit = (env.get('commit') or 'unknown')[:10] + (' (dirty)' if env.get('dirty') else '')
+        print(f"{label:<5}{commit}  {run['created']}  python {env['python']}  opencv {env['opencv']}")
+    changed = sorted(key for key in set(base['params']) | set(new['params'])
+                     if base['params'].get(key) != new['params'].get(key))
+    for key in changed:
+        print(f"param {key}: {base['params'].get(key)!r} -> {new['params'].get(key)!r}")
+
+    before, after = flatten(base['results']), flatten(new['results'])
+    width = max((len(key) for key in before.keys() | after.keys()), default=10)
+    print(f"\n{'metric':<{width}}{'base':>14}{'new':>14}{'change':>10}")
+    for key in sorted(before.keys() | after.keys()):
+        old, cur = before.get(key), after.get(key)
+        change = f'{(cur - old) / old:+.1%}' if old and cur is not None else ''
+        print(f"{key:<{width}}{'' if old is None else f'{old:.4g}':>14}"
+              f"{'' if cur is None else f'{cur:.4g}':>14}{change:>10}")
+
+
+if __name__ == '__main__':
+    main()
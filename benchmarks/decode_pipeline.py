@@ -0,0 +1,65 @@
+"""Time per frame and score agreement of the detection decode modes.
+
+Every mode is compared with the legacy "full" path (colour decode, cvtColor,
+full-resolution cascades) on the same frames:
+
+    python benchmarks/decode_pipeline.py
+    python benchmarks/decode_pipeline.py --frames captures/ --repeat 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from fixtures import load_corpus, load_server
+
+MODES = [
+    ('full', 0),
+    ('gray', 0),
+    ('reduced2', 0),
+    ('reduced4', 0),
+    ('gray', 320),
+]
+
+
+def score(main, frame, mode, target_width):
+    gray, scale = main.decode_frame(frame, mode=mode, target_width=target_width)
+    if gray is None:
+        return 0.0
+    return main.score_frame(gray, scale)['attention']
+
+
+def run(main, frames, mode, target_width, repeat):
+    scores = [score(main, frame, mode, target_width) for frame in frames]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            score(main, frame, mode, target_width)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / (repeat * len(frames)), np.array(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', help='directory of JPEG captures (default: synthetic corpus)')
+    parser.add_argument('--count', type=int, default=6, help='synthetic frames per resolution')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='max |score - full score| counted as agreement')
+    args = parser.parse_args()
+
+    server = load_server()
+    corpus = load_corpus(args.frames, count=args.count)
+    print(f"{'frames':<12}{'mode':<16}{'ms/frame':>10}{'speedup':>9}{'mean |d|':>10}{'agree':>8}")
+    for label, frames in corpus.items():
+        base_ms, base_scores = run(server, frames, 'full', 0, args.repeat)
+        for mode, target_width in MODES:
+            ms, scores = run(server, frames, mode, target_width, args.repeat)
+            diff = np.abs(scores - base_scores)
+            name = f'{mode}@{target_width}' if target_width else mode
+            print(f'{label:<12}{name:<16}{ms:>10.2f}{base_ms / ms:>8.1f}x'
+                  f'{diff.mean():>10.3f}{(diff <= args.tolerance).mean():>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Detection throughput of detect_attention at several frame resolutions.
+
+Runs the full detection call (decode, face search, eye scoring) over the
+fixture corpus on one thread and reports frames per second, per-frame
+latency percentiles and the time spent in each detection stage. Set the same
+DETECTION_* and DETECTOR_BACKEND variables as the server to benchmark another
+configuration:
+
+    python benchmarks/detection.py
+    DETECTION_DECODE=reduced2 python benchmarks/detection.py --json detection.json
+"""
+import argparse
+import time
+
+from fixtures import load_corpus, load_server, percentiles, write_results
+
+
+def run(main, frames, repeat):
+    for frame in frames:
+        main.detect_frames([frame], [None])
+    latencies = []
+    stages = {}
+    faces = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            frame_start = time.perf_counter()
+            results, (samples, _) = main.detect_frames([frame], [None])
+            latencies.append((time.perf_counter() - frame_start) * 1000)
+            faces += results[0]['face'] is not None
+            for stage, elapsed in samples:
+                stages[stage] = stages.get(stage, 0.0) + elapsed * 1000
+    elapsed = time.perf_counter() - start
+    count = repeat * len(frames)
+    return {
+        'frames': count,
+        'fps': count / elapsed,
+        'latency_ms': percentiles(latencies),
+        'stage_ms': {stage: total / count for stage, total in stages.items()},
+        'face_rate': faces / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', help='directory of JPEG captures (default: synthetic corpus)')
+    parser.add_argument('--count', type=int, default=12, help='synthetic frames per resolution')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    server = load_server()
+    server.cv2.setNumThreads(server.CV_NUM_THREADS)
+    corpus = load_corpus(args.frames, count=args.count)
+    results = {}
+    print(f"{'frames':<12}{'fps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'faces':>7}  stages (ms/frame)")
+    for label, frames in corpus.items():
+        result = results[label] = run(server, frames, args.repeat)
+        latency = result['latency_ms']
+        stages = ' '.join(f'{stage}={ms:.2f}' for stage, ms in result['stage_ms'].items())
+        print(f"{label:<12}{result['fps']:>8.1f}{latency['p50']:>9.2f}{latency['p95']:>9.2f}"
+              f"{latency['p99']:>9.2f}{result['face_rate']:>7.0%}  {stages}")
+
+    if args.json:
+        params = {
+            'repeat': args.repeat,
+            'count': args.count,
+            'frames': args.frames,
+            'decode': server.DETECTION_DECODE,
+            'target_width': server.DETECTION_TARGET_WIDTH,
+            'detector': server.DETECTOR_BACKEND,
+            'cv_threads': server.CV_NUM_THREADS,
+        }
+        write_results(args.json, 'detection', params, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Regression check and timing for the vectorised eye scoring stage.
+
+score_eyes must give the same per-eye scores as the original per-eye loop
+(np.mean, cv2.threshold, np.where over the mask). The fixture corpus is the
+eye regions the cascades find on the synthetic face frames plus randomly
+generated regions (noise, flat, dark and bright patches). Exits non-zero on
+any mismatch beyond --tolerance:
+
+    python benchmarks/eye_scoring.py
+"""
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from fixtures import load_corpus, load_server
+
+
+def legacy_eye_scores(eye_regions):
+    """The per-eye loop detect_attention used before score_eyes."""
+    eye_scores = []
+    for roi_gray, eyes in eye_regions:
+        for (ex, ey, ew, eh) in eyes:
+            eye_img = roi_gray[ey:ey+eh, ex:ex+ew]
+            mean_intensity = np.mean(eye_img)
+            threshold = int(mean_intensity * 0.7)
+            _, thresh = cv2.threshold(eye_img, threshold, 255, cv2.THRESH_BINARY_INV)
+            ys, xs = np.where(thresh == 255)
+            if len(xs) > 0:
+                cx = np.mean(xs)
+                cy = np.mean(ys)
+                norm_dist_x = abs(cx - ew / 2) / (ew / 2)
+                norm_dist_y = abs(cy - eh / 2) / (eh / 2)
+                eye_scores.append(1 - (norm_dist_x + norm_dist_y) / 2)
+    return np.array(eye_scores)
+
+
+def detected_regions(main, frames):
+    face_cascade, eye_cascade, _ = main.get_cascades()
+    regions = []
+    for frame in frames:
+        gray, _ = main.decode_frame(frame, mode='full', target_width=0)
+        for (x, y, w, h) in face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3):
+            roi = gray[y:y+h, x:x+w]
+            eyes = eye_cascade.detectMultiScale(roi, scaleFactor=1.1, minNeighbors=3)
+            if len(eyes):
+                regions.append([(roi, eyes)])
+    return regions
+
+
+def random_regions(count, seed=0):
+    rng = np.random.default_rng(seed)
+    regions = []
+    for i in range(count):
+        size = int(rng.integers(40, 240))
+        kind = i % 4
+        if kind == 0:
+            roi = rng.integers(0, 256, (size, size), dtype=np.uint8)
+        elif kind == 1:
+            roi = np.full((size, size), int(rng.integers(0, 256)), np.uint8)
+        elif kind == 2:
+            roi = rng.integers(0, 40, (size, size), dtype=np.uint8)
+        else:
+            roi = cv2.GaussianBlur(rng.integers(100, 256, (size, size), dtype=np.uint8), (9, 9), 0)
+            cv2.circle(roi, tuple(int(v) for v in rng.integers(0, size, 2)), size // 8, 10, -1)
+        eyes = []
+        for _ in range(int(rng.integers(1, 4))):
+            ew, eh = (int(v) for v in rng.integers(4, size // 2, 2))
+            ex, ey = int(rng.integers(0, size - ew)), int(rng.integers(0, size - eh))
+            eyes.append((ex, ey, ew, eh))
+        regions.append([(roi, np.array(eyes, dtype=np.int32))])
+    return regions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', help='directory of JPEG captures (default: synthetic corpus)')
+    parser.add_argument('--random', type=int, default=400, help='number of random eye regions')
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    server = load_server()
+    frames = [f for corpus in load_corpus(args.frames, count=6).values() for f in corpus]
+    corpus = detected_regions(server, frames) + random_regions(args.random)
+    eyes = sum(len(eyes) for case in corpus for _, eyes in case)
+
+    worst = 0.0
+    for case in corpus:
+        expected = legacy_eye_scores(case)
+        actual = server.score_eyes(case)
+        if expected.shape != actual.shape:
+            print(f'FAIL: {len(expected)} legacy scores vs {len(actual)} vectorised')
+            sys.exit(1)
+        if len(expected):
+            worst = max(worst, float(np.max(np.abs(expected - actual))))
+
+    timings = {}
+    for name, fn in (('legacy', legacy_eye_scores), ('score_eyes', server.score_eyes)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for case in corpus:
+                fn(case)
+        timings[name] = (time.perf_counter() - start) * 1e6 / (args.repeat * eyes)
+
+    print(f'{len(corpus)} regions, {eyes} eyes, max |diff| = {worst:.3g}')
+    for name, us in timings.items():
+        print(f'{name:<12}{us:>8.2f} us/eye')
+    if worst > args.tolerance:
+        print(f'FAIL: scores differ by more than {args.tolerance}')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
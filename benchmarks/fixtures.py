@@ -0,0 +1,152 @@
+"""Shared helpers for the benchmark scripts.
+
+The repo does not ship camera captures, so the default corpus is a set of
+deterministic synthetic webcam frames: a drawn face (skin ellipse, hair,
+eye sockets with pupils, nose, mouth) at varying size, position and gaze,
+plus a few empty frames. The Haar cascades pick these up as a frontal face
+with two eyes, which is enough to exercise every stage of detect_attention.
+Pass --frames DIR to any script to use real JPEG captures instead.
+
+Scripts that take --json write their results with write_results(), tagged
+with the commit they ran on; compare.py diffs two such files.
+"""
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+
+
+def load_server(db_path=None):
+    """Import server.main against a throwaway database and data directories.
+
+    The paths are always overridden, so a DB_PATH from the shell or .env can
+    never point the benchmarks at a real database; pass ``db_path`` to pick
+    the scratch database's location.
+    """
+    workdir = tempfile.mkdtemp(prefix='classguard-bench-')
+    os.environ['DB_PATH'] = db_path or os.path.join(workdir, 'attention_scores.db')
+    os.environ['IMAGES_DIR'] = os.path.join(workdir, 'images')
+    os.environ['MEETING_DATA_DIR'] = os.path.join(workdir, 'meeting_data')
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import server.main as main
+    return main
+
+
+def synthetic_face(width, height, center=(0.5, 0.5), face_height=0.45, gaze=(0.0, 0.0), seed=0):
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), (90, 110, 120), np.uint8)
+    cx, cy = int(width * center[0]), int(height * center[1])
+    fh = int(height * face_height)
+    fw = int(fh * 0.8)
+    cv2.ellipse(img, (cx, cy), (fw // 2, fh // 2), 0, 0, 360, (150, 175, 215), -1)
+    cv2.ellipse(img, (cx, cy - fh // 2 + fh // 10), (fw // 2, fh // 6), 0, 180, 360, (40, 40, 60), -1)
+    ex, ey, er = int(fw * 0.22), cy - int(fh * 0.08), max(3, int(fh * 0.06))
+    for side in (-1, 1):
+        c = (cx + side * ex, ey)
+        pupil = (c[0] + int(gaze[0] * er), c[1] + int(gaze[1] * er * 0.5))
+        cv2.ellipse(img, c, (int(er * 2.6), int(er * 1.6)), 0, 0, 360, (110, 130, 165), -1)
+        cv2.line(img, (c[0] - er * 2, c[1] - int(er * 2.2)), (c[0] + er * 2, c[1] - int(er * 2.2)),
+                 (40, 45, 60), max(2, er // 2))
+        cv2.ellipse(img, c, (int(er * 1.9), er), 0, 0, 360, (230, 230, 230), -1)
+        cv2.circle(img, pupil, int(er * 0.85), (60, 70, 90), -1)
+        cv2.circle(img, pupil, int(er * 0.45), (15, 15, 15), -1)
+        cv2.ellipse(img, c, (int(er * 1.9), er), 0, 180, 360, (60, 60, 80), max(1, er // 4))
+    cv2.line(img, (cx, cy - fh // 20), (cx - fh // 25, cy + fh // 8), (110, 130, 170), 2)
+    cv2.ellipse(img, (cx, cy + fh // 4), (fw // 6, fh // 20), 0, 0, 180, (80, 80, 160), max(2, fh // 40))
+    img = (img + rng.normal(0, 5, img.shape)).clip(0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def synthetic_empty(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), (90, 110, 120), np.uint8)
+    return (img + rng.normal(0, 5, img.shape)).clip(0, 255).astype(np.uint8)
+
+
+def encode_jpeg(img, quality=95):
+    ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError('JPEG encoding failed')
+    return buf.tobytes()
+
+
+def synthetic_corpus(width, height, count=12):
+    """JPEG frames at one resolution: mostly faces, one empty frame in six."""
+    frames = []
+    for i in range(count):
+        if i % 6 == 5:
+            frames.append(encode_jpeg(synthetic_empty(width, height, seed=i)))
+            continue
+        center = (0.5 + 0.08 * ((i % 3) - 1), 0.5 + 0.05 * ((i % 2) * 2 - 1))
+        face_height = (0.35, 0.45, 0.55)[i % 3]
+        gaze = (0.4 * ((i % 5) - 2), 0.3 * ((i % 3) - 1))
+        frames.append(encode_jpeg(synthetic_face(width, height, center, face_height, gaze, seed=i)))
+    return frames
+
+
+def load_corpus(frames_dir=None, resolutions=RESOLUTIONS, count=12):
+    """{label: [jpeg bytes]} from a directory of captures or the synthetic set."""
+    if frames_dir:
+        paths = sorted(glob.glob(os.path.join(frames_dir, '*.jp*g')))
+        if not paths:
+            raise SystemExit(f'No JPEG files in {frames_dir}')
+        frames = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                frames.append(f.read())
+        return {os.path.basename(os.path.normpath(frames_dir)): frames}
+    return {f'{w}x{h}': synthetic_corpus(w, h, count) for (w, h) in resolutions}
+
+
+def percentiles(values):
+    """p50/p95/p99 and max of a list of numbers, or Nones when it is empty."""
+    if len(values) == 0:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(np.max(values))}
+
+
+def environment():
+    """Commit, interpreter, OpenCV build and CPU count the numbers came from."""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'cpus': os.cpu_count(),
+        'platform': platform.platform(),
+    }
+
+
+def write_results(path, suite, params, results):
+    """Write one run as JSON to path."""
+    document = {
+        'suite': suite,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'params': params,
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+        f.write('\n')
+    print(f'Wrote {path}')
@@ -0,0 +1,247 @@
+"""Load test: replay extension traffic against a local server.
+
+Starts the server with uvicorn on a scratch database, or targets --url, then
+simulates --meetings x --participants extension instances. Each posts a
+frame to /api/images every --interval seconds (3 s, like the extension),
+starting at a random phase, with one request in flight at a time. Latency is
+measured from the moment a frame was due. A server that falls behind then
+shows up in the percentiles instead of quietly lowering the offered load.
+With --adaptive, each participant waits the server's next_capture_ms
+instead, like the extension does.
+
+    python benchmarks/load.py --meetings 5 --participants 10 --duration 60
+    python benchmarks/load.py --workers 4 --json load.json
+    python benchmarks/load.py --url http://127.0.0.1:3000
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from fixtures import REPO_ROOT, load_corpus, percentiles, write_results
+
+
+def start_server(port, workers):
+    """Run uvicorn on a scratch database; returns the process and its directory."""
+    workdir = tempfile.mkdtemp(prefix='classguard-load-')
+    env = dict(
+        os.environ,
+        DB_PATH=os.path.join(workdir, 'attention_scores.db'),
+        IMAGES_DIR=os.path.join(workdir, 'images'),
+        MEETING_DATA_DIR=os.path.join(workdir, 'meeting_data'),
+        WEB_CONCURRENCY=str(workers),
+    )
+    if workers > 1:
+        # Lets /metrics sum the stage histograms of every worker
+        env['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(workdir, 'metrics')
+        os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'server.main:app', '--host', '127.0.0.1',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=REPO_ROOT, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise SystemExit(f'Server exited with status {process.returncode}')
+        try:
+            if get(f'http://127.0.0.1:{port}', '/api/health')[0] == 200:
+                return process, workdir
+        except OSError:
+            pass
+        time.sleep(0.25)
+    stop_server(process, workdir)
+    raise SystemExit('Server did not come up within 60 s')
+
+
+def stop_server(process, workdir):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def connect(url):
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+
+
+def get(url, path):
+    conn = connect(url)
+    try:
+        conn.request('GET', urlsplit(url).path.rstrip('/') + path)
+        response = conn.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        conn.close()
+
+
+def participant(url, meeting_id, user_email, frames, interval, start_at, stop_at, adaptive, samples):
+    """One extension instance: post a frame whenever the next one is due."""
+    path = urlsplit(url).path.rstrip('/') + '/api/images'
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    conn = connect(url)
+    due = start_at
+    sent_frames = 0
+    while due < stop_at:
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        body = json.dumps({
+            'imageData': frames[sent_frames % len(frames)],
+            'meetingId': meeting_id,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'userId': user_email,
+        })
+        sent = time.monotonic()
+        hint = reused = None
+        try:
+            conn.request('POST', path, body, headers)
+            response = conn.getresponse()
+            payload = response.read()
+            status = response.status
+            if status == 200:
+                result = json.loads(payload)
+                hint, reused = result.get('next_capture_ms'), result.get('reused')
+        except (OSError, http.client.HTTPException, ValueError):
+            status = 'error'
+            conn.close()
+            conn = connect(url)
+        done = time.monotonic()
+        samples.append((due, sent, done, status, reused))
+        sent_frames += 1
+        if adaptive and hint:
+            # The extension counts the hinted delay from its last capture
+            due = sent + hint / 1000
+        else:
+            due += interval
+    conn.close()
+
+
+def server_stages(url):
+    """Mean milliseconds per stage from the server's /metrics histograms."""
+    try:
+        status, text = get(url, '/metrics')
+    except OSError:
+        return None
+    if status != 200:
+        return None
+    sums = dict(re.findall(r'^classguard_stage_seconds_sum\{stage="([^"]+)"\} (\S+)$', text, re.M))
+    counts = dict(re.findall(r'^classguard_stage_seconds_count\{stage="([^"]+)"\} (\S+)$', text, re.M))
+    return {
+        stage: float(sums[stage]) * 1000 / float(count)
+        for stage, count in counts.items() if float(count) > 0 and stage in sums
+    }
+
+
+def summarize(samples, window_start, window_end, users, interval):
+    measured = [s for s in samples if window_start <= s[0] < window_end]
+    ok = [s for s in measured if s[3] == 200]
+    statuses = {}
+    for s in measured:
+        statuses[str(s[3])] = statuses.get(str(s[3]), 0) + 1
+    completed = sum(1 for s in ok if s[2] < window_end)
+    return {
+        'requests': len(measured),
+        'errors': len(measured) - len(ok),
+        'statuses': statuses,
+        'offered_per_sec': users / interval,
+        'throughput_per_sec': completed / (window_end - window_start),
+        'latency_ms': percentiles([(s[2] - s[0]) * 1000 for s in ok]),
+        'service_ms': percentiles([(s[2] - s[1]) * 1000 for s in ok]),
+        'reused_rate': sum(1 for s in ok if s[4]) / len(ok) if ok else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='target a running server instead of starting one')
+    parser.add_argument('--port', type=int, default=3999, help='port for the local server')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers for the local server')
+    parser.add_argument('--meetings', type=int, default=4)
+    parser.add_argument('--participants', type=int, default=10, help='participants per meeting')
+    parser.add_argument('--interval', type=float, default=3.0, help='seconds between frames per participant')
+    parser.add_argument('--adaptive', action='store_true', help="follow the server's next_capture_ms")
+    parser.add_argument('--duration', type=float, default=30.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='seconds run before measuring')
+    parser.add_argument('--frames', help='directory of JPEG captures (default: synthetic corpus)')
+    parser.add_argument('--resolution', default='640x480', help='synthetic frame size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.split('x'))
+    corpus = next(iter(load_corpus(args.frames, resolutions=[(width, height)]).values()))
+    frames = ['data:image/jpeg;base64,' + base64.b64encode(frame).decode() for frame in corpus]
+
+    process = workdir = None
+    url = args.url
+    if url is None:
+        process, workdir = start_server(args.port, args.workers)
+        url = f'http://127.0.0.1:{args.port}'
+    try:
+        rng = random.Random(args.seed)
+        users = [(f'load-m{m}', f'user{p}@example.com') for m in range(args.meetings) for p in range(args.participants)]
+        begin = time.monotonic() + 1
+        window_start = begin + args.warmup
+        window_end = window_start + args.duration
+        samples = []
+        threads = []
+        for index, (meeting_id, user_email) in enumerate(users):
+            # Random phase, and each participant starts at a different frame
+            start_at = begin + rng.uniform(0, args.interval)
+            user_frames = frames[index % len(frames):] + frames[:index % len(frames)]
+            thread = threading.Thread(
+                target=participant, daemon=True,
+                args=(url, meeting_id, user_email, user_frames, args.interval,
+                      start_at, window_end, args.adaptive, samples),
+            )
+            thread.start()
+            threads.append(thread)
+        pace = 'server-paced' if args.adaptive else f'{len(users) / args.interval:.1f} frames/s offered'
+        print(f'{len(users)} participants, {pace}, '
+              f'{args.warmup:.0f} s warmup + {args.duration:.0f} s measured')
+        for thread in threads:
+            thread.join()
+
+        result = summarize(samples, window_start, window_end, len(users), args.interval)
+        if args.adaptive:
+            # The server sets the pace, so there is no fixed offered rate
+            result['offered_per_sec'] = None
+        result['server_stage_ms'] = server_stages(url)
+    finally:
+        if process is not None:
+            stop_server(process, workdir)
+
+    latency, service = result['latency_ms'], result['service_ms']
+    offered = f" of {result['offered_per_sec']:.1f}/s offered" if result['offered_per_sec'] else ''
+    print(f"requests {result['requests']}, errors {result['errors']}, "
+          f"throughput {result['throughput_per_sec']:.1f}/s{offered}")
+    if latency['p50'] is not None:
+        print(f"latency ms  p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  "
+              f"(service p50 {service['p50']:.1f}  p99 {service['p99']:.1f})")
+    if result['server_stage_ms']:
+        print('server stages (mean ms): ' + ' '.join(
+            f'{stage}={ms:.2f}' for stage, ms in sorted(result['server_stage_ms'].items())))
+
+    if args.json:
+        params = {key: value for key, value in vars(args).items() if key != 'json'}
+        write_results(args.json, 'load', params, result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Server startup cost: import time, time to ready and worker memory.
+
+Measures how long a fresh interpreter takes to import server.main (library
+imports, schema migration, model loading), then boots the server on a
+scratch database in each mode and times it until every worker answers
+/api/health. The modes are uvicorn --workers, and gunicorn with
+gunicorn_config.py with and without preload_app when gunicorn is installed.
+On Linux it also sums the workers' proportional set size (Pss), which
+counts pages shared copy-on-write with the master only once:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --workers 4 --runs 3 --json startup.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import REPO_ROOT, write_results
+from load import get
+
+IMPORT_SNIPPET = (
+    'import time; start = time.perf_counter(); import server.main; '
+    'print(time.perf_counter() - start)'
+)
+
+
+def scratch_env(workdir, **extra):
+    return dict(
+        os.environ,
+        DB_PATH=os.path.join(workdir, 'attention_scores.db'),
+        IMAGES_DIR=os.path.join(workdir, 'images'),
+        MEETING_DATA_DIR=os.path.join(workdir, 'meeting_data'),
+        **extra,
+    )
+
+
+def import_seconds():
+    """Seconds to import server.main in a new interpreter on a new database."""
+    workdir = tempfile.mkdtemp(prefix='classguard-startup-')
+    try:
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SNIPPET], cwd=REPO_ROOT, env=scratch_env(workdir),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        return float(output.split()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def server_command(mode, port, workers):
+    if mode == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'server.main:app', '--host', '127.0.0.1',
+                '--port', str(port), '--workers', str(workers), '--log-level', 'warning'], REPO_ROOT
+    # Same directory and app path as a deployment, with logs kept out of the tree
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'main:app',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+            '--access-logfile', os.devnull, '--error-logfile', '-', '--log-level', 'warning'], \
+        os.path.join(REPO_ROOT, 'server')
+
+
+def pss_kb(pid):
+    """Proportional set size of a process in kB, or None where /proc lacks it."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def boot(mode, port, workers, timeout):
+    """Start the server and wait for every worker; returns time to ready and worker Pss."""
+    workdir = tempfile.mkdtemp(prefix='classguard-startup-')
+    extra = {'WEB_CONCURRENCY': str(workers)}
+    if mode == 'uvicorn':
+        if workers > 1:
+            extra['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(workdir, 'metrics')
+            os.makedirs(extra['PROMETHEUS_MULTIPROC_DIR'])
+    else:
+        extra['PRELOAD_APP'] = '1' if mode == 'gunicorn-preload' else '0'
+        extra['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(workdir, 'metrics')
+    command, cwd = server_command(mode, port, workers)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, env=scratch_env(workdir, **extra))
+    url = f'http://127.0.0.1:{port}'
+    pids = set()
+    try:
+        deadline = time.monotonic() + timeout
+        while len(pids) < workers:
+            if process.poll() is not None:
+                raise SystemExit(f'{mode} exited with status {process.returncode}')
+            if time.monotonic() > deadline:
+                raise SystemExit(f'{mode}: {len(pids)} of {workers} workers up after {timeout:.0f} s')
+            try:
+                # A new connection per probe, so the kernel spreads them over workers
+                status, body = get(url, '/api/health')
+                if status == 200:
+                    pids.add(json.loads(body)['pid'])
+                    continue
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.05)
+        ready = time.perf_counter() - start
+        memory = [pss_kb(pid) for pid in pids]
+        return {
+            'ready_s': ready,
+            'worker_pss_mb': sum(memory) / 1024 if None not in memory else None,
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=3, help='boots per mode; the median is reported')
+    parser.add_argument('--port', type=int, default=3998)
+    parser.add_argument('--timeout', type=float, default=120.0, help='seconds to wait for all workers')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    modes = ['uvicorn']
+    if importlib.util.find_spec('gunicorn') is not None:
+        modes += ['gunicorn', 'gunicorn-preload']
+    else:
+        print('gunicorn is not installed; timing uvicorn only')
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    results = {'import_s': statistics.median(imports)}
+    print(f"import server.main: {results['import_s']:.2f} s (median of {args.runs})")
+    print(f"{'mode':<18}{'ready s':>9}{'worker Pss MB':>15}")
+    for mode in modes:
+        runs = [boot(mode, args.port, args.workers, args.timeout) for _ in range(args.runs)]
+        memory = [run['worker_pss_mb'] for run in runs]
+        result = results[mode] = {
+            'ready_s': statistics.median(run['ready_s'] for run in runs),
+            'worker_pss_mb': statistics.median(memory) if None not in memory else None,
+        }
+        pss = '' if result['worker_pss_mb'] is None else f"{result['worker_pss_mb']:.0f}"
+        print(f"{mode:<18}{result['ready_s']:>9.2f}{pss:>15}")
+
+    if args.json:
+        params = {'workers': args.workers, 'runs': args.runs, 'modes': modes}
+        write_results(args.json, 'startup', params, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""SQLite write-path throughput: frames per second and per-write latency.
+
+Writes synthetic scored frames through write_records() into a scratch
+database, the same call the server makes for each frame (batch size 1) and
+for each write-behind flush (larger batches). Frames come from --meetings x
+--participants users, at the extension's 3-second cadence. Set
+SQLITE_SYNCHRONOUS to compare durability settings:
+
+    python benchmarks/storage.py
+    python benchmarks/storage.py --batch-sizes 1 500 --frames 20000 --json storage.json
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from fixtures import load_server, percentiles, write_results
+
+
+def synthetic_records(meetings, participants, count, prefix, seed=0):
+    """count scored frames in capture order: every user once per 3-second tick."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+    users = [(f'{prefix}-m{m}', f'user{p}@example.com') for m in range(meetings) for p in range(participants)]
+    scores = rng.random(count)
+    records = []
+    for i in range(count):
+        meeting_id, user_email = users[i % len(users)]
+        ts = start + timedelta(seconds=3 * (i // len(users)))
+        records.append((meeting_id, user_email, ts.isoformat(), float(scores[i]), False))
+    return records
+
+
+def run(main, records, batch_size):
+    conn = main.get_db()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(records), batch_size):
+        write_start = time.perf_counter()
+        main.write_records(conn, records[i:i + batch_size])
+        latencies.append((time.perf_counter() - write_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        'frames': len(records),
+        'writes': len(latencies),
+        'frames_per_sec': len(records) / elapsed,
+        'write_ms': percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=5000, help='frames written per batch size')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--meetings', type=int, default=20)
+    parser.add_argument('--participants', type=int, default=25)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    server = load_server()
+    results = {}
+    print(f"{'batch':>6}{'frames/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for batch_size in args.batch_sizes:
+        # Fresh meetings per run, so every batch size starts from new rollup rows
+        records = synthetic_records(args.meetings, args.participants, args.frames, f'b{batch_size}')
+        result = results[f'batch_{batch_size}'] = run(server, records, batch_size)
+        latency = result['write_ms']
+        print(f"{batch_size:>6}{result['frames_per_sec']:>11.0f}{latency['p50']:>9.2f}"
+              f"{latency['p95']:>9.2f}{latency['p99']:>9.2f}")
+
+    db_path = server.DB_PATH
+    results['db_bytes'] = sum(
+        os.path.getsize(path) for path in (db_path, db_path + '-wal') if os.path.exists(path)
+    )
+    if args.json:
+        params = {
+            'frames': args.frames,
+            'batch_sizes': args.batch_sizes,
+            'meetings': args.meetings,
+            'participants': args.participants,
+            'synchronous': server.SQLITE_SYNCHRONOUS,
+        }
+        write_results(args.json, 'storage', params, results)
+
+
+if __name__ == '__main__':
+    main()
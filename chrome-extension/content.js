@@ -1,9 +1,31 @@
 // content.js: Improved user identification for Google Meet, with focus on attention detection
 
 const BACKEND_URL = 'https://classguard.onrender.com/api/images';
+const BATCH_URL = BACKEND_URL + '/batch';
+const RAW_URL = BACKEND_URL + '/raw';
+const CONFIG_URL = 'https://classguard.onrender.com/api/capture-config';
+const MAX_QUEUED_FRAMES = 20;
+// The server recommends the delay before the next capture (next_capture_ms)
+// from how steady the score is and how busy it is; these bound the hint.
+const DEFAULT_CAPTURE_MS = 3000;
+const MIN_CAPTURE_MS = 1000;
+const MAX_CAPTURE_MS = 60000;
 let mediaStream = null;
-let captureInterval = null;
+let captureTimer = null;
+let captureVideo = null;
+let captureDelay = DEFAULT_CAPTURE_MS;
+let lastCaptureAt = 0;
+// Frame size and encoding, replaced by the server's /api/capture-config
+let captureConfig = {
+  width: 640,
+  grayscale: true,
+  format: 'image/jpeg',
+  quality: 0.8,
+  interval_ms: DEFAULT_CAPTURE_MS
+};
 let debugMode = true;
+let pendingFrames = [];
+let flushInFlight = false;
 
 // Debug logging function
 function debugLog(message, data) {
@@ -44,11 +66,26 @@ async function getUserEmail() {
   });
 }
 
+async function loadCaptureConfig() {
+  try {
+    const response = await fetch(CONFIG_URL, { headers: { 'Accept': 'application/json' } });
+    if (response.ok) {
+      captureConfig = { ...captureConfig, ...(await response.json()) };
+      debugLog('Loaded capture config', captureConfig);
+    } else {
+      debugLog('Capture config request failed, using defaults', response.status);
+    }
+  } catch (error) {
+    debugLog('Could not load capture config, using defaults', error);
+  }
+}
+
 async function startCameraCapture() {
   debugLog('Starting camera capture');
-  if (captureInterval) {
-    clearInterval(captureInterval);
-    debugLog('Cleared existing capture interval');
+  if (captureTimer) {
+    clearTimeout(captureTimer);
+    captureTimer = null;
+    debugLog('Cleared existing capture timer');
   }
   
   try {
@@ -91,24 +128,53 @@ async function startCameraCapture() {
     // Wait a bit more for the video to fully initialize
     await new Promise(resolve => setTimeout(resolve, 1000));
     
-    debugLog('Setting up capture interval (every 3s)');
-    captureInterval = setInterval(() => {
-      captureAndSendImage(video);
-    }, 3000); // Increase to 3 seconds for more stable detection
+    await loadCaptureConfig();
     
-    // Do an immediate capture
-    setTimeout(() => captureAndSendImage(video), 500);
+    debugLog('Starting capture loop');
+    captureVideo = video;
+    captureDelay = captureConfig.interval_ms || DEFAULT_CAPTURE_MS;
+    
+    // Do an immediate capture; later ones follow the server's pacing
+    scheduleCapture(500);
   } catch (error) {
     debugLog('ERROR accessing camera:', error);
   }
 }
 
+// One timer drives capture. Each tick captures a frame and arms the next tick
+// with the current delay; a server hint that arrives later re-arms it.
+function scheduleCapture(delay) {
+  clearTimeout(captureTimer);
+  captureTimer = setTimeout(() => {
+    lastCaptureAt = Date.now();
+    captureAndSendImage(captureVideo);
+    scheduleCapture(captureDelay);
+  }, delay);
+}
+
+function applyCaptureHint(nextCaptureMs) {
+  if (!Number.isFinite(nextCaptureMs) || !captureTimer) {
+    return;
+  }
+  captureDelay = Math.min(MAX_CAPTURE_MS, Math.max(MIN_CAPTURE_MS, nextCaptureMs));
+  // Count from the last capture, so a slow response does not add to the delay
+  scheduleCapture(Math.max(0, lastCaptureAt + captureDelay - Date.now()));
+  debugLog('Next capture in ' + captureDelay + 'ms');
+}
+
+// The server sheds frames it cannot detect in time (429/503 with Retry-After).
+// Wait at least that long, and twice as long as before while it keeps shedding.
+function backOffCapture(response) {
+  const retryAfterMs = (Number(response.headers.get('Retry-After')) || 0) * 1000;
+  applyCaptureHint(Math.max(retryAfterMs, captureDelay * 2));
+}
+
 function stopCameraCapture() {
   debugLog('Stopping camera capture');
-  if (captureInterval) {
-    clearInterval(captureInterval);
-    captureInterval = null;
-    debugLog('Cleared capture interval');
+  if (captureTimer) {
+    clearTimeout(captureTimer);
+    captureTimer = null;
+    debugLog('Cleared capture timer');
   }
   if (mediaStream) {
     mediaStream.getTracks().forEach(track => track.stop());
@@ -139,16 +205,22 @@ async function captureAndSendImage(video) {
       return;
     }
     
-    // Create canvas and take snapshot
+    // Create canvas and take snapshot, shrunk to the width the server detects at
     debugLog('Creating canvas for capture');
     const canvas = document.createElement('canvas');
-    canvas.width = video.videoWidth;
-    canvas.height = video.videoHeight;
+    const scale = Math.min(1, captureConfig.width / video.videoWidth);
+    canvas.width = Math.round(video.videoWidth * scale);
+    canvas.height = Math.round(video.videoHeight * scale);
     
     const ctx = canvas.getContext('2d');
     try {
+      // Detection only looks at luminance, so colour is just extra bytes
+      if (captureConfig.grayscale) {
+        ctx.filter = 'grayscale(1)';
+      }
       // Proper drawing to canvas to ensure face is detected
       ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+      ctx.filter = 'none';
       
       // Enhancement: Add a visual indicator for face positioning
       // Draw a light face outline guide to help position the face
@@ -194,48 +266,89 @@ async function captureAndSendImage(video) {
       userEmail: userEmail
     });
     
-    // Convert image to data URL - use high quality for better face detection
-    let imageData;
+    // Encode with the format and quality the server asked for
+    let imageBlob;
     try {
-      imageData = canvas.toDataURL('image/jpeg', 0.95); // Higher quality for better face detection
-      debugLog('Image converted to data URL', { 
-        length: imageData.length
+      imageBlob = await new Promise(resolve => canvas.toBlob(resolve, captureConfig.format, captureConfig.quality));
+      if (!imageBlob) {
+        throw new Error('canvas.toBlob returned no data');
+      }
+      debugLog('Image encoded', { 
+        type: imageBlob.type,
+        size: imageBlob.size
       });
     } catch (imageError) {
-      debugLog('ERROR converting image to data URL:', imageError);
+      debugLog('ERROR encoding image:', imageError);
       return;
     }
     
     // Prepare payload with all required fields
     const payload = {
-      imageData: imageData,
+      imageBlob,
       meetingId,
       timestamp,
       userName: userEmail, // Using email as the user name
       userId: userEmail    // Using email as the user ID
     };
     
-    debugLog('Sending data to server');
-    try {
-      const response = await fetch(BACKEND_URL, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
-        },
-        body: JSON.stringify(payload)
-      });
+    enqueueFrame(payload);
+  } catch (error) {
+    debugLog('ERROR in captureAndSendImage:', error);
+  }
+}
+
+// Frames captured while an upload is still in flight (slow network) are
+// queued and sent together to the batch endpoint on the next flush.
+function enqueueFrame(payload) {
+  pendingFrames.push(payload);
+  if (pendingFrames.length > MAX_QUEUED_FRAMES) {
+    const dropped = pendingFrames.splice(0, pendingFrames.length - MAX_QUEUED_FRAMES);
+    debugLog('Send queue full, dropped oldest frames', dropped.length);
+  }
+  if (!flushInFlight) {
+    flushFrames();
+  }
+}
+
+async function flushFrames() {
+  flushInFlight = true;
+  try {
+    while (pendingFrames.length) {
+      const frames = pendingFrames;
+      pendingFrames = [];
+      const isBatch = frames.length > 1;
+      
+      debugLog(isBatch ? `Sending batch of ${frames.length} frames to server` : 'Sending data to server');
+      let response;
+      try {
+        response = isBatch ? await sendBatch(frames) : await sendRawFrame(frames[0]);
+      } catch (fetchError) {
+        debugLog('NETWORK ERROR sending to server:', fetchError);
+        // Keep the frames for the next flush, still bounded by MAX_QUEUED_FRAMES
+        pendingFrames = frames.concat(pendingFrames).slice(-MAX_QUEUED_FRAMES);
+        return;
+      }
       
       if (response.ok) {
         const result = await response.json();
         debugLog('Server response OK', result);
+        applyCaptureHint(result.next_capture_ms);
+        // Frames queued for a detection worker come back without a score
+        const scores = isBatch
+          ? result.results.filter(r => r && r.status === 'success').map(r => r.attention)
+          : (result.status === 'success' ? [result.attention] : []);
         
-        // Check the attention value
-        if (result.attention === 0) {
+        // Check the attention value of the newest frame
+        if (scores.length && scores[scores.length - 1] === 0) {
           debugLog('⚠️ ATTENTION SCORE IS ZERO - MAKE SURE YOUR FACE IS CLEARLY VISIBLE TO THE CAMERA');
-        } else {
+        } else if (scores.length) {
           debugLog('✅ ATTENTION DETECTED!');
         }
+      } else if (response.status === 429 || response.status === 503) {
+        // These frames are stale by now, so drop them rather than resend
+        debugLog(`Server busy (${response.status}), dropped ${frames.length} frame(s)`);
+        backOffCapture(response);
+        return;
       } else {
         const errorText = await response.text();
         debugLog('Server response ERROR', {
@@ -244,10 +357,51 @@ async function captureAndSendImage(video) {
           body: errorText
         });
       }
-    } catch (fetchError) {
-      debugLog('NETWORK ERROR sending to server:', fetchError);
     }
-  } catch (error) {
-    debugLog('ERROR in captureAndSendImage:', error);
+  } finally {
+    flushInFlight = false;
   }
-} 
\ No newline at end of file
+}
+
+// Single frames go to the raw endpoint as the encoded image bytes, metadata in the query
+async function sendRawFrame(frame) {
+  const params = new URLSearchParams({
+    meetingId: frame.meetingId,
+    timestamp: frame.timestamp,
+    userId: frame.userId,
+    userName: frame.userName
+  });
+  return fetch(`${RAW_URL}?${params}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/octet-stream',
+      'Accept': 'application/json'
+    },
+    body: frame.imageBlob
+  });
+}
+
+// The batch endpoint takes JSON, so queued blobs are turned into data URLs here
+async function sendBatch(frames) {
+  const payload = await Promise.all(frames.map(async ({ imageBlob, ...meta }) => ({
+    ...meta,
+    imageData: await blobToDataURL(imageBlob)
+  })));
+  return fetch(BATCH_URL, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': 'application/json'
+    },
+    body: JSON.stringify({ frames: payload })
+  });
+}
+
+function blobToDataURL(blob) {
+  return new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => resolve(reader.result);
+    reader.onerror = () => reject(reader.error);
+    reader.readAsDataURL(blob);
+  });
+}
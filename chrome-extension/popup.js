@@ -46,28 +46,28 @@ document.addEventListener('DOMContentLoaded', function() {
     }
   }
 
-  // Fetch and display attention score
-  function fetchAndDisplayAttentionScore(meetingId, userEmail) {
+  // Subscribe to live scores pushed by the server; EventSource reconnects on its own
+  function subscribeToAttentionScore(meetingId, userEmail) {
     if (!meetingId || !userEmail) {
       attentionScoreDiv.textContent = 'Attention Score: ';
       attentionScoreDiv.style.color = 'gray';
       return;
     }
-    const apiUrl = `https://classguard.onrender.com/api/db-attention-score?meeting_id=${encodeURIComponent(meetingId)}&user_email=${encodeURIComponent(userEmail)}`;
-    fetch(apiUrl)
-      .then(resp => resp.json())
-      .then(data => {
-        const score = data.attention_percent || 0;
-        attentionScoreDiv.textContent = `Attention Score: ${score.toFixed(2)}%`;
-        attentionScoreDiv.style.color = colorForScore(score);
-      })
-      .catch(() => {
-        attentionScoreDiv.textContent = 'Attention Score: ';
-        attentionScoreDiv.style.color = 'gray';
-      });
+    const streamUrl = `https://classguard.onrender.com/api/attention-stream?meeting_id=${encodeURIComponent(meetingId)}&user_email=${encodeURIComponent(userEmail)}`;
+    const scoreStream = new EventSource(streamUrl);
+    scoreStream.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      const score = (data.attention_score || 0) * 100;
+      attentionScoreDiv.textContent = `Attention Score: ${score.toFixed(2)}%`;
+      attentionScoreDiv.style.color = colorForScore(score);
+    };
+    scoreStream.onerror = () => {
+      attentionScoreDiv.textContent = 'Attention Score: ';
+      attentionScoreDiv.style.color = 'gray';
+    };
   }
 
-  // Main logic: find Meet tab, get email, poll score
+  // Main logic: find Meet tab, get email, subscribe to score updates
   function updateAttentionScore() {
     chrome.tabs.query({}, function(tabs) {
       const meetTab = tabs.find(tab => 
@@ -76,7 +76,7 @@ document.addEventListener('DOMContentLoaded', function() {
       if (meetTab) {
         const meetingId = getMeetingIdFromTab(meetTab);
         getUserEmail(function(email) {
-          fetchAndDisplayAttentionScore(meetingId, email);
+          subscribeToAttentionScore(meetingId, email);
         });
       } else {
         attentionScoreDiv.textContent = 'Attention Score: ';
@@ -85,9 +85,8 @@ document.addEventListener('DOMContentLoaded', function() {
     });
   }
 
-  // Initial call and polling
+  // Updates arrive over the stream while the popup is open
   updateAttentionScore();
-  setInterval(updateAttentionScore, 5000);
 
   // Check if there's an active Google Meet tab
   chrome.tabs.query({}, function(tabs) {
@@ -1,16 +1,67 @@
+import gc
 import multiprocessing
+import os
+import shutil
+import tempfile
 
 # Server socket
 bind = "0.0.0.0:3000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
 worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 timeout = 30
 keepalive = 2
 
+# Import the app once in the master and fork the workers from it. Library
+# imports, the schema migration and reading the DNN model files then run once
+# per boot, and workers share those pages copy-on-write instead of repeating
+# the work. Detection pool threads still parse their own Haar cascades, which
+# cannot be shared between threads. PRELOAD_APP=0 goes back to importing in
+# every worker.
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+
+# Let each worker size its detection pool against the real worker count, and
+# share /api/attention's live scores across workers unless told otherwise
+raw_env = [
+    f"WEB_CONCURRENCY={workers}",
+    f"LIVE_STATE_BACKEND={os.getenv('LIVE_STATE_BACKEND', 'shared')}",
+]
+
+# Each worker keeps its /metrics values in files here (prometheus_client
+# multiprocess mode), and any worker's /metrics sums them all. Set in the
+# master so workers inherit it before they import the app.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), f"classguard-metrics-{os.getpid()}"),
+)
+# Created here rather than in on_starting: a preloaded app opens its metric
+# files while the master imports it, before on_starting runs
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+def on_starting(server):
+    # Files left by an earlier run would be summed into this run's counters.
+    # Only the master's own (from preloading) belong to this run.
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    own = f"_{os.getpid()}.db"
+    for name in os.listdir(directory):
+        if not name.endswith(own):
+            os.remove(os.path.join(directory, name))
+
+def pre_fork(server, worker):
+    # Move the preloaded objects out of the collector's reach: a collection in
+    # a worker would otherwise write to their headers and un-share the pages
+    gc.freeze()
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
 # Logging
 accesslog = "access.log"
 errorlog = "error.log"
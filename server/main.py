@@ -1,21 +1,39 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timezone
 import base64
+import contextlib
 import os
+import sys
 import json
-from typing import Optional
+import math
+from typing import List, Optional
 import cv2
 import numpy as np
-from collections import defaultdict, deque
+from collections import Counter, OrderedDict, deque
 import sqlite3
-from fastapi.responses import HTMLResponse, JSONResponse
+import tempfile
+import asyncio
+import multiprocessing
+import random
+import re
+import signal
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager, BaseProxy
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi import Request, Query
 import csv
 from io import StringIO
+from urllib.parse import quote
+import logging
 from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter as MetricCounter, Histogram, generate_latest, multiprocess
 
 # Load environment variables
 load_dotenv()
@@ -28,6 +46,134 @@ PORT = int(os.getenv('PORT', 3000))
 HOST = os.getenv('HOST', '0.0.0.0')
 ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'chrome-extension://*').split(',')
 
+# Where detect_attention runs: "inline" (on the event loop), "thread" or "process" pool
+DETECTION_EXECUTOR = os.getenv('DETECTION_EXECUTOR', 'thread')
+# Pool size per web worker; 0 sizes it from the CPU count (see detection_pool_size)
+DETECTION_POOL_SIZE = int(os.getenv('DETECTION_POOL_SIZE', 0))
+# OpenCV's internal threads per detection call (cv2.setNumThreads)
+CV_NUM_THREADS = int(os.getenv('CV_NUM_THREADS', 1))
+# Number of gunicorn/uvicorn workers sharing this machine
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+# Upper bound on frames accepted by /api/images/batch
+MAX_BATCH_FRAMES = int(os.getenv('MAX_BATCH_FRAMES', 64))
+# Decode stage for detection: "full" (colour decode + cvtColor), "gray", or
+# "reduced2"/"reduced4"/"reduced8" (grayscale decoded at 1/2, 1/4, 1/8 size)
+DETECTION_DECODE = os.getenv('DETECTION_DECODE', 'full')
+# Downscale decoded frames wider than this many pixels (0 keeps the decoded size)
+DETECTION_TARGET_WIDTH = int(os.getenv('DETECTION_TARGET_WIDTH', 0))
+# Per-user face tracking: search near the last face box instead of the whole frame
+FACE_TRACKING = os.getenv('FACE_TRACKING', '1') == '1'
+# Force a full-frame search after this many consecutive tracked frames
+TRACK_REFRESH_FRAMES = int(os.getenv('TRACK_REFRESH_FRAMES', 10))
+# Forget users that sent no frame for this long
+TRACK_TTL_SECONDS = float(os.getenv('TRACK_TTL_SECONDS', 120))
+# Search window padding (fraction of the face size per side) and allowed size change
+TRACK_MARGIN = 0.5
+TRACK_MIN_SCALE = 0.7
+TRACK_MAX_SCALE = 1.4
+# Reuse the last score when a user's frame is unchanged since the last detected one
+FRAME_SKIP = os.getenv('FRAME_SKIP', '1') == '1'
+# Largest per-pixel change (grey levels, on a 32x24 thumbnail) still counted as unchanged
+FRAME_SKIP_THRESHOLD = int(os.getenv('FRAME_SKIP_THRESHOLD', 8))
+# Run detection anyway after this many consecutive reused scores
+FRAME_SKIP_MAX_REUSE = int(os.getenv('FRAME_SKIP_MAX_REUSE', 5))
+FRAME_SKIP_THUMB_SIZE = (32, 24)
+# Capture interval recommended to the extension (ms): first value and bounds
+CAPTURE_INTERVAL_MS = int(os.getenv('CAPTURE_INTERVAL_MS', 3000))
+CAPTURE_INTERVAL_MIN_MS = int(os.getenv('CAPTURE_INTERVAL_MIN_MS', 2000))
+CAPTURE_INTERVAL_MAX_MS = int(os.getenv('CAPTURE_INTERVAL_MAX_MS', 15000))
+# Score change between a user's frames up to which attention counts as steady
+CAPTURE_STEADY_DELTA = float(os.getenv('CAPTURE_STEADY_DELTA', 0.05))
+# Interval stretch per steady frame
+CAPTURE_INTERVAL_GROWTH = 1.25
+# Capture parameters advertised to the extension by /api/capture-config: frame
+# width (detection gains nothing from more pixels), grayscale, and encoding
+CAPTURE_WIDTH = int(os.getenv('CAPTURE_WIDTH', DETECTION_TARGET_WIDTH or 640))
+CAPTURE_GRAYSCALE = os.getenv('CAPTURE_GRAYSCALE', '1') == '1'
+CAPTURE_FORMAT = os.getenv('CAPTURE_FORMAT', 'jpeg')
+if CAPTURE_FORMAT not in ('jpeg', 'webp'):
+    raise ValueError(f"Unknown CAPTURE_FORMAT: {CAPTURE_FORMAT}")
+CAPTURE_QUALITY = float(os.getenv('CAPTURE_QUALITY', 0.8))
+# Admission control: bound the frames waiting for detection and shed the rest
+ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', '1') == '1'
+# Frames that may wait for detection per web worker; 0 allows 4 per pool worker
+ADMISSION_MAX_DEPTH = int(os.getenv('ADMISSION_MAX_DEPTH', 0))
+# Seconds a frame may wait before it is dropped (by then the next capture supersedes it)
+ADMISSION_DEADLINE = float(os.getenv('ADMISSION_DEADLINE', CAPTURE_INTERVAL_MS / 1000))
+# Allow the sampling profiler (/api/profiler/*) to be switched on at runtime
+PROFILER = os.getenv('PROFILER', '0') == '1'
+# Default seconds between profiler samples
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.01))
+# Face detector backend: "cascade" (Haar frontal + profile) or "dnn" (res10 SSD)
+DETECTOR_BACKEND = os.getenv('DETECTOR_BACKEND', 'cascade')
+# Directory holding deploy.prototxt and the res10 caffemodel (shipped in server/models)
+DNN_MODEL_DIR = os.getenv('DNN_MODEL_DIR', os.path.join(os.path.dirname(__file__), 'models'))
+# Minimum SSD confidence for a face
+DNN_CONFIDENCE = float(os.getenv('DNN_CONFIDENCE', 0.5))
+# SQLite durability: NORMAL only fsyncs at WAL checkpoints (safe against app crashes)
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+if SQLITE_SYNCHRONOUS not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+    raise ValueError(f"Unknown SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}")
+# Seconds a writer waits on a locked database before failing
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 10))
+# Write-behind: buffer scored frames in memory and flush them to SQLite in bulk
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '0') == '1'
+# Flush when this many frames are buffered...
+WRITE_BEHIND_MAX_ROWS = int(os.getenv('WRITE_BEHIND_MAX_ROWS', 500))
+# ...or after this many seconds, whichever comes first
+WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', 1.0))
+# Ingest waits for a flush once this many frames are buffered (slow disk)
+WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', 5000))
+# Seconds between flushes of the in-memory meeting registry
+MEETING_REGISTRY_INTERVAL = float(os.getenv('MEETING_REGISTRY_INTERVAL', 5.0))
+# Meeting and user ids each worker keeps cached, least recently used dropped first
+DICTIONARY_CACHE_SIZE = int(os.getenv('DICTIONARY_CACHE_SIZE', 10000))
+# Rows fetched from SQLite per chunk of a streamed /api/export
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 5000))
+# Where /api/attention's rolling windows live: "local" (this process),
+# "shared" (shared memory for all workers on the host) or "manager" (the
+# `python main.py live-state-server` process, shared across nodes)
+LIVE_STATE_BACKEND = os.getenv('LIVE_STATE_BACKEND', 'local')
+# Frames per (meeting, user) rolling window
+LIVE_STATE_WINDOW = int(os.getenv('LIVE_STATE_WINDOW', 30))
+# Seconds without frames after which a live (meeting, user) session is dropped
+LIVE_STATE_TTL = float(os.getenv('LIVE_STATE_TTL', 300))
+# Most live sessions kept in process (local backend and live state server)
+LIVE_STATE_MAX_SESSIONS = int(os.getenv('LIVE_STATE_MAX_SESSIONS', 10000))
+# Fixed number of (meeting, user) slots in the shared memory segment
+LIVE_STATE_SLOTS = int(os.getenv('LIVE_STATE_SLOTS', 4096))
+# Shared memory segment name; derived from DB_PATH so deployments don't collide
+LIVE_STATE_NAME = os.getenv('LIVE_STATE_NAME', f"classguard-live-{zlib.crc32(os.path.abspath(DB_PATH).encode()):08x}")
+# host:port and auth key of the live state server
+LIVE_STATE_ADDRESS = os.getenv('LIVE_STATE_ADDRESS', '127.0.0.1:50055')
+LIVE_STATE_AUTHKEY = os.getenv('LIVE_STATE_AUTHKEY', 'classguard').encode()
+# Where frames are scored: "web" (in the web workers) or "worker" (web workers
+# only validate and queue frames; `python main.py detection-worker` scores them)
+DETECTION_TIER = os.getenv('DETECTION_TIER', 'web')
+# Job queue for the worker tier: "local" (this process, scored by a worker it
+# runs itself), "sqlite" (a file shared by the processes on one host) or
+# "manager" (the `python main.py job-queue-server` process, shared across nodes)
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'sqlite')
+# SQLite file of the sqlite job queue, kept apart from DB_PATH
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', DB_PATH + '-jobs')
+# host:port and auth key of the job queue server
+JOB_QUEUE_ADDRESS = os.getenv('JOB_QUEUE_ADDRESS', '127.0.0.1:50056')
+JOB_QUEUE_AUTHKEY = os.getenv('JOB_QUEUE_AUTHKEY', 'classguard').encode()
+# Waiting frames beyond which the web tier answers 503
+JOB_QUEUE_MAX_DEPTH = int(os.getenv('JOB_QUEUE_MAX_DEPTH', 1000))
+# Frames a detection worker claims at a time; 0 claims one per pool worker
+JOB_BATCH_SIZE = int(os.getenv('JOB_BATCH_SIZE', 0))
+# Seconds an idle detection worker waits before looking for jobs again
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 0.05))
+# Seconds between detection worker heartbeats; three missed ones mark it dead
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv('WORKER_HEARTBEAT_INTERVAL', 5.0))
+# Seconds between reads of scores recorded by other workers for /api/attention-stream
+LIVE_PUSH_INTERVAL = float(os.getenv('LIVE_PUSH_INTERVAL', 1.0))
+# Seconds of silence before a stream sends an SSE keep-alive comment
+LIVE_PUSH_KEEPALIVE = float(os.getenv('LIVE_PUSH_KEEPALIVE', 15.0))
+
+logger = logging.getLogger("attention-tracker")
+
 app = FastAPI()
 
 # Mount the actual images directory to serve static files
@@ -54,47 +200,741 @@ app.add_middleware(
 os.makedirs(IMAGES_DIR, exist_ok=True)
 os.makedirs(MEETING_DATA_DIR, exist_ok=True)
 
-# In-memory attention tracking: { (meetingId, userId): deque([0/1,...]) }
-ATTENTION_HISTORY = defaultdict(lambda: deque(maxlen=30))  # last 30 frames
-# Short-term buffer for robust detection
-SHORT_TERM_HISTORY = defaultdict(lambda: deque(maxlen=5))  # last 5 frames
+
+# imdecode flag and downscale factor for each non-"full" decode mode
+DECODE_MODES = {
+    'gray': (cv2.IMREAD_GRAYSCALE, 1.0),
+    'reduced2': (cv2.IMREAD_REDUCED_GRAYSCALE_2, 2.0),
+    'reduced4': (cv2.IMREAD_REDUCED_GRAYSCALE_4, 4.0),
+    'reduced8': (cv2.IMREAD_REDUCED_GRAYSCALE_8, 8.0),
+}
+
+class LazyCascade:
+    """Haar cascade that parses its XML on first use.
+
+    The profile cascade is the largest of the three and only runs when the
+    frontal search finds nothing, so a worker or pool thread that never
+    needs it never loads it.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._classifier = None
+
+    def detectMultiScale(self, *args, **kwargs):
+        if self._classifier is None:
+            self._classifier = cv2.CascadeClassifier(cv2.data.haarcascades + self.filename)
+        return self._classifier.detectMultiScale(*args, **kwargs)
 
 # Load Haar cascades for face and eyes (use a more robust frontal face model)
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_alt2.xml')
-eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-profile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_profileface.xml')
+def load_cascades():
+    face = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_alt2.xml')
+    eye = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    profile = LazyCascade('haarcascade_profileface.xml')
+    return face, eye, profile
 
-# --- SQLite setup ---
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS attention_scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            meeting_id TEXT NOT NULL,
-            user_email TEXT NOT NULL,
-            date TEXT NOT NULL,
-            attention REAL,
-            updated_at TEXT,
-            attention_sum REAL DEFAULT 0,
-            attention_count INTEGER DEFAULT 0,
-            UNIQUE(meeting_id, user_email, date)
+face_cascade, eye_cascade, profile_cascade = load_cascades()
+
+# --- Metrics ---
+# With PROMETHEUS_MULTIPROC_DIR set (gunicorn_config.py does), prometheus_client
+# keeps every worker's values in per-process files that /metrics sums.
+STAGE_SECONDS = Histogram(
+    'classguard_stage_seconds', 'Time spent in each ingest stage', ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENTS = {
+    'frames_detected': MetricCounter('classguard_frames_detected', 'Frames scored by the face detector'),
+    'frames_reused': MetricCounter('classguard_frames_reused', 'Unchanged frames that reused the previous score'),
+    'faces_found': MetricCounter('classguard_faces_found', 'Faces found in detected frames'),
+    'profile_fallbacks': MetricCounter('classguard_profile_fallbacks', 'Frames searched with the profile cascade'),
+    'eyes_found': MetricCounter('classguard_eyes_found', 'Eyes found inside detected faces'),
+    'frames_superseded': MetricCounter('classguard_frames_superseded', 'Waiting frames replaced by a newer frame of the same user'),
+    'frames_expired': MetricCounter('classguard_frames_expired', 'Frames dropped after waiting past the admission deadline'),
+    'frames_rejected': MetricCounter('classguard_frames_rejected', 'Frames refused because the admission queue was full'),
+    'live_state_errors': MetricCounter('classguard_live_state_errors', 'Scores saved but not applied to the live state'),
+}
+
+# Detection can run in a pool process, whose metrics would never reach
+# /metrics. While detect_frames() runs, stage times and events are collected
+# here instead and returned with the results, and the web worker records them.
+_stage_local = threading.local()
+
+@contextlib.contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        samples = getattr(_stage_local, 'samples', None)
+        if samples is None:
+            STAGE_SECONDS.labels(stage).observe(elapsed)
+        else:
+            samples.append((stage, elapsed))
+
+def count_event(event, amount=1):
+    counts = getattr(_stage_local, 'counts', None)
+    if counts is None:
+        EVENTS[event].inc(amount)
+    else:
+        counts[event] = counts.get(event, 0) + amount
+
+def record_stats(stats):
+    samples, counts = stats
+    for stage, elapsed in samples:
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+    for event, amount in counts.items():
+        EVENTS[event].inc(amount)
+
+def metrics_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+class StackSampler:
+    """Wall-clock sampling profiler for the threads of this process.
+
+    A background thread reads every other thread's Python stack each
+    ``interval`` seconds and counts identical stacks. folded() returns them in
+    the folded format that flamegraph.pl and speedscope read. Idle threads
+    are sampled too, so their waits show up next to the work.
+    """
+
+    def __init__(self):
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.interval = None
+        self.samples = 0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval):
+        if self._thread is not None:
+            return
+        self.interval = interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def folded(self):
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+stack_sampler = StackSampler()
+
+# --- Detection executor ---
+# CascadeClassifier and cv2.dnn instances are not safe to share between
+# threads, so every pool worker (thread or process) loads its own copies once
+# in the initializer.
+_worker_state = threading.local()
+
+def detection_pool_size():
+    if DETECTION_POOL_SIZE > 0:
+        return DETECTION_POOL_SIZE
+    # Split the machine between web workers, and leave room for the threads
+    # OpenCV itself starts inside each detection call.
+    cpus = multiprocessing.cpu_count()
+    return max(1, cpus // (max(1, WEB_CONCURRENCY) * max(1, CV_NUM_THREADS)))
+
+def _init_detection_worker():
+    cv2.setNumThreads(CV_NUM_THREADS)
+    _worker_state.cascades = load_cascades()
+    _worker_state.detector = load_detector()
+
+def get_cascades():
+    cascades = getattr(_worker_state, 'cascades', None)
+    if cascades is None:
+        return face_cascade, eye_cascade, profile_cascade
+    return cascades
+
+def get_detector():
+    detector = getattr(_worker_state, 'detector', None)
+    if detector is None:
+        return face_detector
+    return detector
+
+_detection_executor = None
+# Frames waiting for or running detection in this worker (the ingest queue depth)
+_detections_in_flight = 0
+
+def get_detection_executor():
+    global _detection_executor
+    if _detection_executor is None and DETECTION_EXECUTOR != 'inline':
+        size = detection_pool_size()
+        if DETECTION_EXECUTOR == 'process':
+            # spawn rather than fork: the event loop and its threads are already running
+            _detection_executor = ProcessPoolExecutor(
+                max_workers=size,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_detection_worker,
+            )
+        elif DETECTION_EXECUTOR == 'thread':
+            _detection_executor = ThreadPoolExecutor(
+                max_workers=size,
+                thread_name_prefix='detect',
+                initializer=_init_detection_worker,
+            )
+        else:
+            raise ValueError(f"Unknown DETECTION_EXECUTOR: {DETECTION_EXECUTOR}")
+    return _detection_executor
+
+def detect_frames(images, hints):
+    """analyze_frames() plus the stage times and events it recorded."""
+    _stage_local.samples, _stage_local.counts = [], {}
+    try:
+        results = analyze_frames(images, hints)
+        return results, (_stage_local.samples, _stage_local.counts)
+    finally:
+        _stage_local.samples = _stage_local.counts = None
+
+async def run_detection(image_bytes, hint=None):
+    return (await run_detection_batch([image_bytes], [hint]))[0]
+
+async def run_detection_batch(images, hints, max_chunks=None):
+    """Detect a batch in at most ``max_chunks`` pool tasks (default: one per pool worker)."""
+    global _detections_in_flight
+    executor = get_detection_executor()
+    if executor is None:
+        results, stats = detect_frames(images, hints)
+        record_stats(stats)
+        return results
+    # One chunk per pool worker keeps the per-task overhead (pickling for the
+    # process pool) to a handful of calls per batch.
+    size = detection_pool_size() if max_chunks is None else min(max_chunks, detection_pool_size())
+    chunk = max(1, -(-len(images) // size))
+    loop = asyncio.get_running_loop()
+    _detections_in_flight += len(images)
+    try:
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(executor, detect_frames, images[i:i + chunk], hints[i:i + chunk])
+            for i in range(0, len(images), chunk)
+        ))
+    finally:
+        _detections_in_flight -= len(images)
+    for _, stats in chunks:
+        record_stats(stats)
+    return [result for results, _ in chunks for result in results]
+
+def ingest_backlog():
+    """How far behind ingest is: 1.0 means every pool worker is busy.
+
+    Frames queued for detection are counted per pool worker. In the worker
+    tier, frames waiting in the job queue count per detection worker slot,
+    as of the queue status enqueue_frame() last read. With write-behind on,
+    a buffer past its flush size counts as well.
+    """
+    queued = _detections_in_flight + (len(admission) if admission is not None else 0)
+    backlog = queued / detection_pool_size() if DETECTION_EXECUTOR != 'inline' else 0.0
+    status = _job_status["status"] if job_queue is not None else None
+    if status is not None:
+        slots = sum(worker["slots"] for worker in live_workers(status))
+        backlog = max(backlog, status["waiting"] / slots if slots else 0.0)
+    if write_behind is not None:
+        backlog = max(backlog, len(write_behind) / write_behind.max_rows)
+    return backlog
+
+@app.on_event("startup")
+async def start_detection_executor():
+    get_detection_executor()
+
+# The in-process worker of a local job queue (see start_local_detection_worker)
+_local_worker = {"task": None, "stop": None}
+
+# Registered ahead of the other shutdown hooks, so the worker finishes its
+# claimed frames while the pool, registry and write-behind buffer still run
+@app.on_event("shutdown")
+async def stop_local_detection_worker():
+    if _local_worker["task"] is not None:
+        _local_worker["stop"].set()
+        await _local_worker["task"]
+        _local_worker["task"] = None
+
+@app.on_event("shutdown")
+async def stop_detection_executor():
+    global _detection_executor
+    if _detection_executor is not None:
+        _detection_executor.shutdown(wait=True)
+        _detection_executor = None
+
+# --- Admission control ---
+class FrameDropped(Exception):
+    """A frame shed by admission control instead of being detected."""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def as_http_exception(self):
+        return HTTPException(
+            status_code=self.status_code, detail=str(self),
+            headers={"Retry-After": str(self.retry_after)},
         )
+
+class AdmissionQueue:
+    """Bounded line of frames waiting for detection in this worker.
+
+    At most ``slots`` frames (one per pool worker) are detected at once; the
+    rest wait here in arrival order, at most one per (meeting, user). A newer
+    frame from the same user takes the waiting frame's place, and the older
+    one is answered with 429. With ``max_depth`` frames waiting, new frames
+    are refused with 503, and a frame still waiting after ``deadline``
+    seconds is dropped with 503, since the user's next capture replaces it
+    anyway. Both carry a Retry-After estimate of when the line will have
+    cleared.
+    """
+
+    def __init__(self, slots, max_depth, deadline):
+        self.slots = slots
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self._active = 0
+        self._waiting = OrderedDict()
+        # Running mean of seconds a slot is held, for Retry-After
+        self._hold = 0.0
+        self.admitted = 0
+        self.superseded = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def retry_after(self):
+        """Whole seconds until the frames ahead would have been detected."""
+        return max(1, math.ceil((len(self._waiting) + self._active) / self.slots * self._hold))
+
+    async def acquire(self, key):
+        if self._active < self.slots and not self._waiting:
+            self._active += 1
+            self.admitted += 1
+            return
+        previous = self._waiting.get(key)
+        if previous is not None:
+            self.superseded += 1
+            count_event('frames_superseded')
+            if not previous.done():
+                previous.set_exception(FrameDropped(429, "Frame superseded by a newer one", self.retry_after()))
+        elif len(self._waiting) >= self.max_depth:
+            self.rejected += 1
+            count_event('frames_rejected')
+            raise FrameDropped(503, "Detection queue is full", self.retry_after())
+        # Replacing the entry keeps the user's place in line
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting[key] = waiter
+        try:
+            await asyncio.wait_for(waiter, self.deadline)
+        except asyncio.TimeoutError:
+            self.expired += 1
+            count_event('frames_expired')
+            raise FrameDropped(503, "Frame expired waiting for detection", self.retry_after()) from None
+        except asyncio.CancelledError:
+            # The request went away just as the slot was handed over
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release()
+            raise
+        finally:
+            if self._waiting.get(key) is waiter:
+                del self._waiting[key]
+        self.admitted += 1
+
+    def try_acquire(self):
+        """Take a free slot without waiting, unless frames are already in line."""
+        if self._active < self.slots and not self._waiting:
+            self._active += 1
+            return True
+        return False
+
+    def release(self, held=None):
+        if held is not None:
+            self._hold = held if not self._hold else 0.8 * self._hold + 0.2 * held
+        # Hand the slot straight to the longest-waiting frame still wanting it
+        while self._waiting:
+            _, waiter = self._waiting.popitem(last=False)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def metrics(self):
+        return {
+            "slots": self.slots,
+            "max_depth": self.max_depth,
+            "deadline": self.deadline,
+            "active": self._active,
+            "waiting": len(self._waiting),
+            "admitted": self.admitted,
+            "superseded": self.superseded,
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
+
+def load_admission():
+    if not ADMISSION_CONTROL:
+        return None
+    slots = detection_pool_size() if DETECTION_EXECUTOR != 'inline' else 1
+    return AdmissionQueue(slots, ADMISSION_MAX_DEPTH or 4 * slots, ADMISSION_DEADLINE)
+
+admission = load_admission()
+
+@contextlib.asynccontextmanager
+async def detection_slot(key, wanted=1):
+    """Hold this worker's detection slots; raises FrameDropped when shed.
+
+    Waits in line for one slot, then also takes up to ``wanted`` - 1 slots
+    that are free right now, and yields how many are held.
+    """
+    if admission is None:
+        yield wanted
+        return
+    with timed('admission'):
+        await admission.acquire(key)
+    held = 1
+    while held < wanted and admission.try_acquire():
+        held += 1
+    start = time.perf_counter()
+    try:
+        yield held
+    finally:
+        admission.release(time.perf_counter() - start)
+        for _ in range(held - 1):
+            admission.release()
+
+# --- Timestamps ---
+def parse_timestamp(timestamp):
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+def to_epoch_ms(timestamp):
+    """ISO-8601 client timestamp -> integer milliseconds since the epoch (UTC).
+
+    Timestamps without an offset are taken as UTC.
+    """
+    parsed = parse_timestamp(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return round(parsed.timestamp() * 1000)
+
+def format_epoch_ms(ms):
+    """Epoch milliseconds -> ISO-8601 UTC string in the extension's format."""
+    seconds, millis = divmod(int(ms), 1000)
+    stamp = datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    return f"{stamp}.{millis:03d}Z"
+
+# --- SQLite setup ---
+# Bumped whenever the schema changes; stored in PRAGMA user_version.
+SCHEMA_VERSION = 4
+
+# Meetings and users are stored once in dictionary tables and referenced by
+# integer id, so history rows hold four numbers instead of two repeated strings
+# and an ISO timestamp. The covering index serves the per-user history query
+# (and any time-range scan) without touching the table itself.
+SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS meetings (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        email TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS attention_scores (
+        meeting_id INTEGER NOT NULL REFERENCES meetings(id),
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        date TEXT NOT NULL,
+        attention REAL,
+        updated_at TEXT,
+        attention_sum REAL DEFAULT 0,
+        attention_count INTEGER DEFAULT 0,
+        PRIMARY KEY (meeting_id, user_id, date)
+    ) WITHOUT ROWID;
+    -- Attention history (per image), ts in epoch milliseconds UTC. reused is 1
+    -- when the frame was unchanged and the previous score was carried over
+    CREATE TABLE IF NOT EXISTS attention_history (
+        id INTEGER PRIMARY KEY,
+        meeting_id INTEGER NOT NULL REFERENCES meetings(id),
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        ts INTEGER NOT NULL,
+        attention REAL NOT NULL,
+        reused INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_history_meeting_user_ts
+        ON attention_history (meeting_id, user_id, ts, attention);
+    -- Per-minute rollup of attention_history, minute_ts is the minute start in epoch ms
+    CREATE TABLE IF NOT EXISTS attention_minutes (
+        meeting_id INTEGER NOT NULL REFERENCES meetings(id),
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        minute_ts INTEGER NOT NULL,
+        attention_count INTEGER NOT NULL,
+        attention_sum REAL NOT NULL,
+        attention_min REAL NOT NULL,
+        attention_max REAL NOT NULL,
+        PRIMARY KEY (meeting_id, user_id, minute_ts)
+    ) WITHOUT ROWID;
+    -- Meeting registry, first_seen and last_seen are frame timestamps in epoch ms
+    CREATE TABLE IF NOT EXISTS meeting_participants (
+        meeting_id INTEGER NOT NULL REFERENCES meetings(id),
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        first_seen INTEGER NOT NULL,
+        last_seen INTEGER NOT NULL,
+        frame_count INTEGER NOT NULL,
+        PRIMARY KEY (meeting_id, user_id)
+    ) WITHOUT ROWID;
+'''
+
+MINUTE_MS = 60 * 1000
+
+def create_schema(conn):
+    # executescript() would commit the caller's transaction, so run statements one by one
+    for statement in SCHEMA_SQL.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+def _legacy_epoch_ms(timestamp):
+    # SQL function for the v0 -> v1 copy; unparseable rows are dropped
+    try:
+        return to_epoch_ms(timestamp)
+    except (TypeError, ValueError):
+        return None
+
+def _migrate_v0_to_v1(conn):
+    """Rewrite the original text-keyed tables into the integer-keyed schema."""
+    conn.create_function('legacy_epoch_ms', 1, _legacy_epoch_ms)
+    conn.execute('ALTER TABLE attention_scores RENAME TO attention_scores_v0')
+    conn.execute('ALTER TABLE attention_history RENAME TO attention_history_v0')
+    create_schema(conn)
+    conn.execute('''
+        INSERT OR IGNORE INTO meetings (name)
+        SELECT meeting_id FROM attention_scores_v0
+        UNION SELECT meeting_id FROM attention_history_v0
     ''')
-    # New table for attention history (per image)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS attention_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            meeting_id TEXT NOT NULL,
-            user_email TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            attention REAL NOT NULL
+    conn.execute('''
+        INSERT OR IGNORE INTO users (email)
+        SELECT user_email FROM attention_scores_v0
+        UNION SELECT user_email FROM attention_history_v0
+    ''')
+    conn.execute('''
+        INSERT INTO attention_scores
+            (meeting_id, user_id, date, attention, updated_at, attention_sum, attention_count)
+        SELECT m.id, u.id, s.date, s.attention, s.updated_at, s.attention_sum, s.attention_count
+        FROM attention_scores_v0 s
+        JOIN meetings m ON m.name = s.meeting_id
+        JOIN users u ON u.email = s.user_email
+    ''')
+    conn.execute('''
+        INSERT INTO attention_history (meeting_id, user_id, ts, attention)
+        SELECT meeting_id, user_id, ts, attention FROM (
+            SELECT m.id AS meeting_id, u.id AS user_id,
+                   legacy_epoch_ms(h.timestamp) AS ts, h.attention AS attention, h.id AS old_id
+            FROM attention_history_v0 h
+            JOIN meetings m ON m.name = h.meeting_id
+            JOIN users u ON u.email = h.user_email
         )
+        WHERE ts IS NOT NULL
+        ORDER BY old_id
     ''')
-    conn.commit()
-    conn.close()
+    conn.execute('DROP TABLE attention_scores_v0')
+    conn.execute('DROP TABLE attention_history_v0')
+
+def rebuild_rollups(conn, meeting_ref=None):
+    """Recompute attention_minutes from attention_history.
+
+    Covers one meeting (by integer id) or, by default, everything. The
+    caller owns the transaction. Returns the number of rollup rows written.
+    """
+    where = "WHERE meeting_id=?" if meeting_ref is not None else ""
+    params = (meeting_ref,) if meeting_ref is not None else ()
+    conn.execute(f"DELETE FROM attention_minutes {where}", params)
+    return conn.execute(f'''
+        INSERT INTO attention_minutes
+            (meeting_id, user_id, minute_ts, attention_count, attention_sum, attention_min, attention_max)
+        SELECT meeting_id, user_id, (ts / {MINUTE_MS}) * {MINUTE_MS} AS minute_ts,
+               COUNT(*), SUM(attention), MIN(attention), MAX(attention)
+        FROM attention_history {where}
+        GROUP BY meeting_id, user_id, minute_ts
+    ''', params).rowcount
+
+def init_db():
+    # Autocommit mode, so the migration below controls its own transaction
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+    # WAL lets readers and the single writer proceed concurrently; the mode is
+    # stored in the database file, so every later connection inherits it.
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Every worker runs this at import; the write lock makes the first one
+    # migrate and the rest see the new version.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            legacy = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='attention_history'"
+            ).fetchone()
+            if legacy and version == 0:
+                _migrate_v0_to_v1(conn)
+            create_schema(conn)
+            if version < 2:
+                # attention_minutes is new in v2; fill it from existing history
+                rebuild_rollups(conn)
+            if version < 3:
+                # meeting_participants is new in v3; seed it from history
+                conn.execute('''
+                    INSERT OR IGNORE INTO meeting_participants
+                        (meeting_id, user_id, first_seen, last_seen, frame_count)
+                    SELECT meeting_id, user_id, MIN(ts), MAX(ts), COUNT(*)
+                    FROM attention_history
+                    GROUP BY meeting_id, user_id
+                ''')
+            if version < 4:
+                # attention_history.reused is new in v4. Tables created above
+                # already have it, older ones get it with a constant default,
+                # which SQLite adds without rewriting the rows.
+                columns = [row[1] for row in conn.execute('PRAGMA table_info(attention_history)')]
+                if 'reused' not in columns:
+                    conn.execute('ALTER TABLE attention_history ADD COLUMN reused INTEGER NOT NULL DEFAULT 0')
+            conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
 init_db()
 
+# One long-lived connection per thread in each worker process. Opening a
+# connection per write forced a fresh file open and fsync on every frame.
+_db_local = threading.local()
+
+def get_db():
+    conn = getattr(_db_local, 'conn', None)
+    # A connection must not cross a fork, so reopen it in a new process
+    if conn is None or _db_local.pid != os.getpid():
+        conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT)
+        conn.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        _db_local.conn = conn
+        _db_local.pid = os.getpid()
+    return conn
+
+# Dictionary ids never change once assigned, so each worker caches them. The
+# caches are LRU-bounded, since a long-running worker sees an endless stream
+# of meetings; the lock covers lookups from write-behind executor threads.
+_dictionary_ids = {'meetings': OrderedDict(), 'users': OrderedDict()}
+_dictionary_lock = threading.Lock()
+_DICTIONARY_COLUMNS = {'meetings': 'name', 'users': 'email'}
+
+def lookup_ids(conn, table, keys):
+    """Map meeting names or user emails to their ids, adding unseen ones.
+
+    New keys are committed on their own, before the caller's data
+    transaction, so a rolled-back write never leaves a cached id behind.
+    """
+    cache = _dictionary_ids[table]
+    ids = {}
+    missing = []
+    with _dictionary_lock:
+        for key in set(keys):
+            if key in cache:
+                cache.move_to_end(key)
+                ids[key] = cache[key]
+            else:
+                missing.append(key)
+    if missing:
+        column = _DICTIONARY_COLUMNS[table]
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+                [(key,) for key in missing],
+            )
+        for key in missing:
+            row = conn.execute(f"SELECT id FROM {table} WHERE {column}=?", (key,)).fetchone()
+            ids[key] = row[0]
+        with _dictionary_lock:
+            for key in missing:
+                cache[key] = ids[key]
+            while len(cache) > DICTIONARY_CACHE_SIZE:
+                cache.popitem(last=False)
+    return ids
+
+INSERT_HISTORY_SQL = '''
+    INSERT INTO attention_history (meeting_id, user_id, ts, attention, reused)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Folds attention_sum/attention_count into the daily row in a single statement.
+# SET expressions see the row's old values, so the average uses the new totals.
+UPSERT_SCORE_SQL = '''
+    INSERT INTO attention_scores (meeting_id, user_id, date, attention, updated_at, attention_sum, attention_count)
+    VALUES (?, ?, ?, ? / ?, ?, ?, ?)
+    ON CONFLICT(meeting_id, user_id, date) DO UPDATE SET
+        attention = (attention_sum + excluded.attention_sum) / (attention_count + excluded.attention_count),
+        attention_sum = attention_sum + excluded.attention_sum,
+        attention_count = attention_count + excluded.attention_count,
+        updated_at = excluded.updated_at
+'''
+
+# Merges a batch's per-minute aggregate into the stored rollup row
+UPSERT_MINUTE_SQL = '''
+    INSERT INTO attention_minutes
+        (meeting_id, user_id, minute_ts, attention_count, attention_sum, attention_min, attention_max)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(meeting_id, user_id, minute_ts) DO UPDATE SET
+        attention_count = attention_count + excluded.attention_count,
+        attention_sum = attention_sum + excluded.attention_sum,
+        attention_min = MIN(attention_min, excluded.attention_min),
+        attention_max = MAX(attention_max, excluded.attention_max)
+'''
+
+# Merges one worker's registry deltas into the shared participant row
+UPSERT_PARTICIPANT_SQL = '''
+    INSERT INTO meeting_participants (meeting_id, user_id, first_seen, last_seen, frame_count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(meeting_id, user_id) DO UPDATE SET
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen),
+        frame_count = frame_count + excluded.frame_count
+'''
+
+def upsert_score(conn, meeting_id, user_id, date, attention_sum, attention_count):
+    now_iso = datetime.now().isoformat()
+    conn.execute(UPSERT_SCORE_SQL, (
+        meeting_id, user_id, date, attention_sum, attention_count,
+        now_iso, attention_sum, attention_count,
+    ))
+
 class ImageData(BaseModel):
     imageData: str
     meetingId: str
@@ -102,28 +942,230 @@ class ImageData(BaseModel):
     userId: Optional[str] = None  # Using userId for email now
     userName: Optional[str] = None  # Using userName for email as fallback
 
-def detect_attention(image_bytes):
+class ImageBatch(BaseModel):
+    frames: List[ImageData]
+
+def decode_frame(image_bytes, mode=None, target_width=None):
+    """Decode to an equalised grayscale frame for detection.
+
+    Returns (gray, scale), where scale is the number of source pixels per
+    frame pixel along each axis, or (None, 1.0) if the bytes do not decode.
+    """
+    mode = mode or DETECTION_DECODE
+    target_width = DETECTION_TARGET_WIDTH if target_width is None else target_width
     nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
-        return 0
-    
-    # Convert to grayscale and enhance contrast
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    gray = cv2.equalizeHist(gray)
+    if mode == 'full':
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img is None:
+            return None, 1.0
+        # Convert to grayscale
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        scale = 1.0
+    else:
+        flag, scale = DECODE_MODES[mode]
+        # libjpeg skips the chroma planes and scales in the DCT domain
+        gray = cv2.imdecode(nparr, flag)
+        if gray is None:
+            return None, 1.0
 
-    # Try to detect frontal face first
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3)
-    face_score = 0
-    
-    # If no frontal face, try profile face
+    if target_width and gray.shape[1] > target_width:
+        factor = gray.shape[1] / target_width
+        height = max(1, round(gray.shape[0] / factor))
+        gray = cv2.resize(gray, (target_width, height), interpolation=cv2.INTER_AREA)
+        scale *= factor
+
+    # Enhance contrast
+    return cv2.equalizeHist(gray), scale
+
+def detect_attention(image_bytes):
+    return analyze_frame(image_bytes)["attention"]
+
+def analyze_frame(image_bytes, hint=None):
+    """Score one encoded frame.
+
+    hint is the tracked face box from the previous frame as fractions of the
+    frame size (x, y, w, h). The result holds the score, the best face box in
+    the same form, and whether it was found inside the hinted region.
+    """
+    return analyze_frames([image_bytes], [hint])[0]
+
+def analyze_frames(images, hints):
+    # Decode everything first so the detector sees the whole batch at once
+    decoded = []
+    for image_bytes in images:
+        with timed('image_decode'):
+            decoded.append(decode_frame(image_bytes))
+    valid = [i for i, (gray, _) in enumerate(decoded) if gray is not None]
+    found = get_detector().find_faces_batch(
+        [decoded[i][0] for i in valid], [hints[i] for i in valid]
+    )
+    results = [{"attention": 0, "face": None, "tracked": False} for _ in images]
+    for i, (faces, tracked) in zip(valid, found):
+        gray, scale = decoded[i]
+        results[i] = score_faces(gray, scale, faces, tracked)
+    return results
+
+# --- Face detector backends ---
+class CascadeFaceDetector:
+    """Haar frontal cascade with a profile fallback (the original detector)."""
+
+    name = 'cascade'
+
+    def find_faces(self, gray, hint=None):
+        face_cascade, _, profile_cascade = get_cascades()
+
+        with timed('face_detect'):
+            # Search around the tracked face first, then fall back to the full frame
+            faces = ()
+            tracked = False
+            if hint is not None:
+                faces = search_tracked_face(gray, hint, face_cascade)
+                tracked = len(faces) > 0
+
+            # Try to detect frontal face first
+            if not tracked:
+                faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3)
+
+        # If no frontal face, try profile face
+        if len(faces) == 0:
+            count_event('profile_fallbacks')
+            with timed('profile_fallback'):
+                faces = profile_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3)
+        return faces, tracked
+
+    def find_faces_batch(self, grays, hints):
+        return [self.find_faces(gray, hint) for gray, hint in zip(grays, hints)]
+
+class DnnFaceDetector:
+    """OpenCV DNN face detector (ResNet-10 SSD, Caffe) running on the CPU.
+
+    A whole batch of frames goes through one forward pass. The network always
+    sees a 300x300 input and finds frontal and turned faces alike, so tracking
+    hints and the profile fallback are not needed.
+    """
+
+    name = 'dnn'
+
+    def __init__(self, prototxt, model, confidence):
+        # prototxt and model are file paths or in-memory buffers (dnn_model_buffers)
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+
+    def find_faces(self, gray, hint=None):
+        return self.find_faces_batch([gray], [hint])[0]
+
+    def find_faces_batch(self, grays, hints):
+        if not grays:
+            return []
+        # The model was trained on BGR input with these channel means
+        blob = cv2.dnn.blobFromImages(
+            [cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) for gray in grays],
+            1.0, (300, 300), (104.0, 177.0, 123.0),
+        )
+        with timed('face_detect'):
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+
+        faces = [[] for _ in grays]
+        # Each row: image index in the batch, label, confidence, box corners (0..1)
+        for image_id, _, confidence, x0, y0, x1, y1 in detections:
+            if confidence < self.confidence:
+                continue
+            img_height, img_width = grays[int(image_id)].shape
+            x0, y0 = max(0.0, x0) * img_width, max(0.0, y0) * img_height
+            x1, y1 = min(1.0, x1) * img_width, min(1.0, y1) * img_height
+            if x1 - x0 < 10 or y1 - y0 < 10:
+                continue
+            faces[int(image_id)].append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+        return [(found, False) for found in faces]
+
+# The res10 model files, read once per process. With preload_app the master
+# reads them before forking, so every worker's pool threads build their nets
+# from the same copy-on-write pages instead of each reading 10 MB from disk.
+_dnn_model = None
+
+def dnn_model_buffers():
+    global _dnn_model
+    if _dnn_model is None:
+        _dnn_model = (
+            np.fromfile(os.path.join(DNN_MODEL_DIR, 'deploy.prototxt'), np.uint8),
+            np.fromfile(os.path.join(DNN_MODEL_DIR, 'res10_300x300_ssd_iter_140000.caffemodel'), np.uint8),
+        )
+    return _dnn_model
+
+def load_detector():
+    if DETECTOR_BACKEND == 'cascade':
+        return CascadeFaceDetector()
+    if DETECTOR_BACKEND == 'dnn':
+        return DnnFaceDetector(*dnn_model_buffers(), DNN_CONFIDENCE)
+    raise ValueError(f"Unknown DETECTOR_BACKEND: {DETECTOR_BACKEND}")
+
+face_detector = load_detector()
+
+def search_tracked_face(gray, hint, face_cascade):
+    img_height, img_width = gray.shape
+    x, y = hint[0] * img_width, hint[1] * img_height
+    w, h = hint[2] * img_width, hint[3] * img_height
+
+    # Enlarged window around the last face, clipped to the frame
+    x0 = max(0, int(x - w * TRACK_MARGIN))
+    y0 = max(0, int(y - h * TRACK_MARGIN))
+    x1 = min(img_width, int(x + w * (1 + TRACK_MARGIN)))
+    y1 = min(img_height, int(y + h * (1 + TRACK_MARGIN)))
+    size = max(w, h)
+    min_side = max(20, int(size * TRACK_MIN_SCALE))
+    max_side = min(x1 - x0, y1 - y0, int(size * TRACK_MAX_SCALE))
+    if max_side < min_side:
+        return ()
+
+    faces = face_cascade.detectMultiScale(
+        gray[y0:y1, x0:x1], scaleFactor=1.1, minNeighbors=3,
+        minSize=(min_side, min_side), maxSize=(max_side, max_side),
+    )
     if len(faces) == 0:
-        faces = profile_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3)
-        if len(faces) > 0:
-            face_score = 0.5  # Profile face detected, partial score
-    
+        return ()
+    return [(fx + x0, fy + y0, fw, fh) for (fx, fy, fw, fh) in faces]
+
+def score_frame(gray, scale=1.0, hint=None):
+    faces, tracked = get_detector().find_faces(gray, hint)
+    return score_faces(gray, scale, faces, tracked)
+
+def score_eyes(eye_regions):
+    """Pupil-centring score for every eye of every face, as one array.
+
+    eye_regions holds (roi_gray, eyes) pairs, eyes being the (ex, ey, ew, eh)
+    boxes the eye cascade found inside roi_gray. Each eye is thresholded at
+    70% of its mean intensity and the dark pixels' centroid is compared with
+    the box centre. Each eye costs three C reductions (mean, threshold, binary
+    image moments) with no per-pixel coordinate arrays; the scores are then
+    computed for all eyes at once. Eyes without dark pixels are skipped.
+    """
+    moments = []
+    for roi_gray, eyes in eye_regions:
+        for (x, y, w, h) in np.asarray(eyes).reshape(-1, 4):
+            eye_img = roi_gray[y:y+h, x:x+w]
+            threshold = int(cv2.mean(eye_img)[0] * 0.7)
+            _, thresh = cv2.threshold(eye_img, threshold, 255, cv2.THRESH_BINARY_INV)
+            m = cv2.moments(thresh, binaryImage=True)
+            moments.append((m['m00'], m['m10'], m['m01'], w, h))
+    if not moments:
+        return np.empty(0)
+
+    m00, m10, m01, ew, eh = np.array(moments, dtype=np.float64).T
+    found = m00 > 0
+    # Pupil position relative to the eye centre, 0 when centred and 1 at the edge
+    norm_dist_x = np.abs(m10[found] / m00[found] - ew[found] / 2) / (ew[found] / 2)
+    norm_dist_y = np.abs(m01[found] / m00[found] - eh[found] / 2) / (eh[found] / 2)
+    return 1 - (norm_dist_x + norm_dist_y) / 2
+
+def score_faces(gray, scale, faces, tracked):
+    _, eye_cascade, _ = get_cascades()
+
     if len(faces) == 0:
-        return 0  # No face detected
+        return {"attention": 0, "face": None, "tracked": False}  # No face detected
+    count_event('faces_found', len(faces))
 
     # Calculate face position score
     img_height, img_width = gray.shape
@@ -146,149 +1188,1876 @@ def detect_attention(image_bytes):
         face_scores.append((position_score + size_score) / 2)
 
     # Get the best face score
-    face_score = max(face_scores) if face_scores else 0
+    best = int(np.argmax(face_scores))
+    face_score = face_scores[best]
+    bx, by, bw, bh = faces[best]
+    face_box = (float(bx / img_width), float(by / img_height), float(bw / img_width), float(bh / img_height))
 
     # Eye detection and scoring
-    eye_scores = []
-    for (x, y, w, h) in faces:
-        roi_gray = gray[y:y+h, x:x+w]
-        eyes = eye_cascade.detectMultiScale(roi_gray, scaleFactor=1.1, minNeighbors=3)
-        
-        if len(eyes) == 0:
-            continue
+    with timed('eyes'):
+        eye_regions = []
+        for (x, y, w, h) in faces:
+            roi_gray = gray[y:y+h, x:x+w]
+            if scale > 1:
+                # Face geometry is resolution independent, but the eye cascade needs
+                # the detail back: search a source-resolution copy of the face only.
+                roi_gray = cv2.resize(roi_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+            eyes = eye_cascade.detectMultiScale(roi_gray, scaleFactor=1.1, minNeighbors=3)
             
-        for (ex, ey, ew, eh) in eyes:
-            eye_img = roi_gray[ey:ey+eh, ex:ex+ew]
-            
-            # Calculate eye region intensity
-            mean_intensity = np.mean(eye_img)
-            threshold = int(mean_intensity * 0.7)
-            _, thresh = cv2.threshold(eye_img, threshold, 255, cv2.THRESH_BINARY_INV)
-            
-            # Find pupil position
-            ys, xs = np.where(thresh == 255)
-            if len(xs) > 0:
-                cx = np.mean(xs)
-                cy = np.mean(ys)
-                
-                # Calculate how centered the pupil is
-                center_x = ew / 2
-                center_y = eh / 2
-                norm_dist_x = abs(cx - center_x) / (ew / 2)
-                norm_dist_y = abs(cy - center_y) / (eh / 2)
-                
-                # Combined eye score (1 if perfectly centered, 0 if at edge)
-                eye_score = 1 - (norm_dist_x + norm_dist_y)/2
-                eye_scores.append(eye_score)
+            if len(eyes) == 0:
+                continue
+            count_event('eyes_found', len(eyes))
+            eye_regions.append((roi_gray, eyes))
+
+        eye_scores = score_eyes(eye_regions)
 
     # Calculate final attention score
-    if eye_scores:
+    if len(eye_scores):
         eye_score = np.mean(eye_scores)
         # Combine face and eye scores with weights
         attention_score = (face_score * 0.4 + eye_score * 0.6)
-        return float(attention_score)
     else:
         # If no eyes detected but face is present, return partial score
-        return float(face_score * 0.4)
+        attention_score = face_score * 0.4
+    return {"attention": float(attention_score), "face": face_box, "tracked": tracked}
 
-@app.post("/api/images")
-async def receive_image(data: ImageData):
-    try:
-        image_data = data.imageData.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        timestamp = datetime.fromisoformat(data.timestamp.replace('Z', '+00:00'))
-        
-        # Get user email - prioritize userId, fallback to userName
-        user_email = data.userId or data.userName or "unknown"
-        
-        meeting_data = {
-            "meetingId": data.meetingId,
-            "userEmail": user_email,
-            "timestamp": data.timestamp,
+# --- Face tracking ---
+class FaceTracker:
+    """Last face box per (meetingId, userEmail), used to narrow the next search.
+
+    Webcam users barely move between snapshots, so most frames only need the
+    cascade run over a window around the previous face. A full-frame search
+    still happens on a miss and every ``refresh_frames`` frames, and entries
+    that stop receiving frames are dropped after ``ttl`` seconds.
+    """
+
+    def __init__(self, refresh_frames, ttl):
+        self.refresh_frames = refresh_frames
+        self.ttl = ttl
+        self._entries = {}
+        self._last_sweep = time.monotonic()
+
+    def hint(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry["face"] is None:
+            return None
+        if entry["tracked_frames"] >= self.refresh_frames:
+            return None
+        return entry["face"]
+
+    def update(self, key, result):
+        now = time.monotonic()
+        entry = self._entries.setdefault(key, {"face": None, "tracked_frames": 0, "seen": now})
+        entry["face"] = result["face"]
+        entry["tracked_frames"] = entry["tracked_frames"] + 1 if result["tracked"] else 0
+        entry["seen"] = now
+        if now - self._last_sweep > self.ttl:
+            self.evict(now)
+
+    def evict(self, now=None):
+        now = time.monotonic() if now is None else now
+        stale = [key for key, entry in self._entries.items() if now - entry["seen"] > self.ttl]
+        for key in stale:
+            del self._entries[key]
+        self._last_sweep = now
+        return len(stale)
+
+    def __len__(self):
+        return len(self._entries)
+
+face_tracker = FaceTracker(TRACK_REFRESH_FRAMES, TRACK_TTL_SECONDS)
+
+def tracking_hint(key):
+    return face_tracker.hint(key) if FACE_TRACKING else None
+
+# --- Frame change detection ---
+def frame_thumbnail(image_bytes):
+    # The JPEG decoder's 1/8 scale skips most of the IDCT work, so this costs
+    # a fraction of the decode detection does.
+    small = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+    return cv2.resize(small, FRAME_SKIP_THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+class FrameChangeDetector:
+    """Last detected frame per (meetingId, userEmail), used to skip detection.
+
+    A frame whose bytes are identical to the last detected one, or whose
+    thumbnail differs from it by at most ``threshold`` grey levels in every
+    pixel, gets that frame's result back instead of a new detection. Frames
+    are always compared with the last *detected* frame, so a slow drift
+    cannot accumulate, and after ``max_reuse`` reused scores in a row the
+    frame is detected anyway. Entries are dropped after ``ttl`` seconds
+    without frames.
+    """
+
+    def __init__(self, threshold, max_reuse, ttl):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.ttl = ttl
+        self._entries = {}
+        self._last_sweep = time.monotonic()
+        self.frames = 0
+        self.identical = 0
+        self.unchanged = 0
+        self.forced = 0
+
+    async def check(self, key, image_bytes):
+        """Return ``(result, signature)`` for a frame.
+
+        ``result`` is the cached detection result when the frame is
+        unchanged, else None. In that case the caller runs detection and
+        passes ``signature`` and the new result to update().
+        """
+        self.frames += 1
+        digest = (len(image_bytes), zlib.crc32(image_bytes))
+        entry = self._entries.get(key)
+        if entry is not None and entry["reused"] >= self.max_reuse:
+            self.forced += 1
+            entry = None
+        if entry is not None and entry["digest"] == digest:
+            self.identical += 1
+            return self._reuse(entry), None
+        loop = asyncio.get_running_loop()
+        thumb = await loop.run_in_executor(None, frame_thumbnail, image_bytes)
+        if entry is not None and thumb is not None and entry["thumb"] is not None:
+            if int(np.abs(thumb - entry["thumb"]).max()) <= self.threshold:
+                self.unchanged += 1
+                return self._reuse(entry), None
+        return None, (digest, thumb)
+
+    def _reuse(self, entry):
+        entry["reused"] += 1
+        entry["seen"] = time.monotonic()
+        return entry["result"]
+
+    def update(self, key, signature, result):
+        now = time.monotonic()
+        digest, thumb = signature
+        self._entries[key] = {"digest": digest, "thumb": thumb, "result": result, "reused": 0, "seen": now}
+        if now - self._last_sweep > self.ttl:
+            self.evict(now)
+
+    def evict(self, now=None):
+        now = time.monotonic() if now is None else now
+        stale = [key for key, entry in self._entries.items() if now - entry["seen"] > self.ttl]
+        for key in stale:
+            del self._entries[key]
+        self._last_sweep = now
+        return len(stale)
+
+    def metrics(self):
+        skipped = self.identical + self.unchanged
+        return {
+            "frames": self.frames,
+            "skipped": skipped,
+            "identical": self.identical,
+            "unchanged": self.unchanged,
+            "forced": self.forced,
+            "skip_rate": round(skipped / self.frames, 4) if self.frames else 0.0,
+            "tracked": len(self._entries),
         }
-        meeting_data_path = os.path.join(MEETING_DATA_DIR, f"{data.meetingId}.json")
-        with open(meeting_data_path, 'w') as f:
-            json.dump(meeting_data, f, indent=2)
-        
-        # --- Attention detection ---
-        key = (data.meetingId, user_email)
-        raw_attention = detect_attention(image_bytes)
-        
-        # Store the continuous attention score directly
-        attention = raw_attention
-        
-        # Store userEmail in a parallel dict for display
-        if not hasattr(receive_image, 'user_emails'):
-            receive_image.user_emails = {}
-        
-        receive_image.user_emails[key] = user_email
-        ATTENTION_HISTORY[key].append(attention)
-        
-        # --- Store attention history for graph ---
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO attention_history (meeting_id, user_email, timestamp, attention) VALUES (?, ?, ?, ?)",
-            (data.meetingId, user_email, data.timestamp, float(attention))
-        )
-        conn.commit()
-        conn.close()
-        
-        # --- SQLite upsert for running average ---
+
+    def __len__(self):
+        return len(self._entries)
+
+frame_changes = FrameChangeDetector(
+    FRAME_SKIP_THRESHOLD, FRAME_SKIP_MAX_REUSE, TRACK_TTL_SECONDS
+) if FRAME_SKIP else None
+
+async def check_frame_change(key, image_bytes):
+    if frame_changes is None:
+        return None, None
+    return await frame_changes.check(key, image_bytes)
+
+def record_detection(key, signature, result):
+    face_tracker.update(key, result)
+    if frame_changes is not None and signature is not None:
+        frame_changes.update(key, signature, result)
+
+def decode_image_payload(image_data):
+    # Strip the "data:image/jpeg;base64," prefix sent by the extension
+    return base64.b64decode(image_data.split(',')[1])
+
+# --- Meeting registry ---
+class MeetingRegistry:
+    """Participants of each meeting: first/last frame time and frame count.
+
+    seen() only updates a dict on the request path. Every ``interval``
+    seconds flush() merges the pending deltas into meeting_participants
+    with an upsert that keeps the earliest first_seen and latest last_seen
+    and adds the frame counts, so workers flushing concurrently combine
+    their views instead of overwriting each other. Each touched meeting's
+    MEETING_DATA_DIR/{meetingId}.json is then rewritten from the merged
+    rows via a temp file and os.replace, so readers never see a partial file.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        # (meeting_id, user_email) -> [first_ms, last_ms, frames]
+        self._pending = {}
+        # flush() swaps the dict on an executor thread
+        self._lock = threading.Lock()
+        # One flush at a time: cancelling _run does not stop a flush already
+        # on an executor thread, and stop()'s final flush would otherwise
+        # race it on the same per-process snapshot temp files.
+        self._flush_lock = threading.Lock()
+        self._task = None
+
+    def seen(self, meeting_id, user_email, timestamp):
+        ts = to_epoch_ms(timestamp)
+        with self._lock:
+            entry = self._pending.get((meeting_id, user_email))
+            if entry is None:
+                self._pending[(meeting_id, user_email)] = [ts, ts, 1]
+            else:
+                entry[0] = min(entry[0], ts)
+                entry[1] = max(entry[1], ts)
+                entry[2] += 1
+
+    def flush(self):
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        conn = get_db()
+        try:
+            meeting_ids = lookup_ids(conn, 'meetings', [key[0] for key in pending])
+            user_ids = lookup_ids(conn, 'users', [key[1] for key in pending])
+            with conn:
+                conn.executemany(UPSERT_PARTICIPANT_SQL, [
+                    (meeting_ids[meeting_id], user_ids[user_email], first, last, frames)
+                    for (meeting_id, user_email), (first, last, frames) in pending.items()
+                ])
+        except Exception:
+            # Merge the deltas back so the next flush retries them
+            with self._lock:
+                for key, (first, last, frames) in pending.items():
+                    self._pending.setdefault(key, [first, last, 0])
+                    entry = self._pending[key]
+                    entry[0] = min(entry[0], first)
+                    entry[1] = max(entry[1], last)
+                    entry[2] += frames
+            raise
+        for meeting_id in {key[0] for key in pending}:
+            write_meeting_snapshot(conn, meeting_id)
+        return len(pending)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception:
+                logger.exception("Meeting registry flush failed; will retry")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+def write_meeting_snapshot(conn, meeting_id):
+    rows = conn.execute(
+        """SELECT u.email, p.first_seen, p.last_seen, p.frame_count
+           FROM meetings m
+           JOIN meeting_participants p ON p.meeting_id = m.id
+           JOIN users u ON u.id = p.user_id
+           WHERE m.name=?
+           ORDER BY p.first_seen""",
+        (meeting_id,)
+    ).fetchall()
+    if not rows:
+        return
+    latest = max(rows, key=lambda row: row[2])
+    meeting_data = {
+        "meetingId": meeting_id,
+        # Most recent frame, as in the original per-frame file
+        "userEmail": latest[0],
+        "timestamp": format_epoch_ms(latest[2]),
+        "participants": [
+            {
+                "userEmail": email,
+                "firstSeen": format_epoch_ms(first),
+                "lastSeen": format_epoch_ms(last),
+                "frames": frames,
+            }
+            for email, first, last, frames in rows
+        ],
+    }
+    meeting_data_path = os.path.join(MEETING_DATA_DIR, f"{meeting_id}.json")
+    temp_path = f"{meeting_data_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(meeting_data, f, indent=2)
+    os.replace(temp_path, meeting_data_path)
+
+meeting_registry = MeetingRegistry(MEETING_REGISTRY_INTERVAL)
+
+@app.on_event("startup")
+async def start_meeting_registry():
+    meeting_registry.start()
+
+@app.on_event("shutdown")
+async def stop_meeting_registry():
+    await meeting_registry.stop()
+
+# --- Live attention state ---
+class LiveWindow:
+    """The last ``size`` scores of one session and their running sum."""
+
+    __slots__ = ('values', 'total', 'appends')
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.appends = 0
+
+    def add(self, score):
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(score)
+        self.total += score
+        self.appends += 1
+        # Re-sum once per window so rounding error cannot build up
+        if self.appends % self.values.maxlen == 0:
+            self.total = sum(self.values)
+
+    def mean(self):
+        return self.total / len(self.values)
+
+class LocalLiveState:
+    """Rolling windows of recent scores in this process, indexed by meeting.
+
+    Each (meeting, user) session keeps a running sum, so reading a score is
+    O(1) and reading a meeting only touches that meeting's sessions.
+    Sessions without a frame for ``ttl`` seconds are evicted, and beyond
+    ``max_sessions`` the least recently updated ones go first.
+
+    Also the object served by ``python main.py live-state-server``, where
+    the manager calls it from one thread per connection, hence the lock.
+    """
+
+    def __init__(self, window, ttl, max_sessions):
+        self.window = window
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # meeting_id -> {user_email: LiveWindow}
+        self._meetings = {}
+        # (meeting_id, user_email) -> last update, least recent first
+        self._recent = OrderedDict()
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def record(self, meeting_id, user_email, attention, now=None):
+        """Add a score; returns the new window mean."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            users = self._meetings.setdefault(meeting_id, {})
+            session = users.get(user_email)
+            if session is None:
+                session = users[user_email] = LiveWindow(self.window)
+            session.add(float(attention))
+            self._recent[(meeting_id, user_email)] = now
+            self._recent.move_to_end((meeting_id, user_email))
+            self._evict(now)
+            return session.mean()
+
+    def _evict(self, now):
+        # _recent is ordered by last update, so only stale entries are visited
+        while self._recent:
+            (meeting_id, user_email), seen = next(iter(self._recent.items()))
+            if now - seen <= self.ttl and len(self._recent) <= self.max_sessions:
+                break
+            del self._recent[(meeting_id, user_email)]
+            users = self._meetings[meeting_id]
+            del users[user_email]
+            if not users:
+                del self._meetings[meeting_id]
+            self._evicted += 1
+
+    def scores(self, meeting_id=None):
+        """[(meeting_id, user_email, mean attention over the window)]"""
+        with self._lock:
+            self._evict(time.monotonic())
+            meetings = list(self._meetings) if meeting_id is None else [meeting_id]
+            return [
+                (key_meeting, user_email, session.mean())
+                for key_meeting in meetings
+                for user_email, session in self._meetings.get(key_meeting, {}).items()
+            ]
+
+    def metrics(self):
+        with self._lock:
+            self._evict(time.monotonic())
+            approx_bytes = sum(
+                sys.getsizeof(session.values) + 24 * len(session.values)
+                for users in self._meetings.values()
+                for session in users.values()
+            )
+            return {
+                "backend": "local",
+                "sessions": len(self._recent),
+                "meetings": len(self._meetings),
+                "capacity": self.max_sessions,
+                "evicted": self._evicted,
+                "approx_bytes": approx_bytes,
+            }
+
+class SharedMemoryLiveState:
+    """Rolling windows in a shared memory segment mapped by every worker.
+
+    The segment holds a small header and ``slots`` fixed-size records, each
+    with a (meeting, user) key, a ring buffer of the last ``window`` scores,
+    their running sum and a sequence counter. The records double as an
+    open-addressing hash table keyed by CRC32 of the key, so all processes
+    share one key index; a CRC32 of the meeting alone lets a meeting's
+    sessions be selected with one vectorised comparison. A key only ever
+    lives within ``PROBE_SLOTS`` slots of its hash, so a lookup is one
+    vectorised scan of that window however many slots have been freed.
+
+    Writers lock only the slot they touch, using fcntl byte-range locks on a
+    companion lock file; claiming or evicting a slot also locks the index
+    range. Readers take no locks: the sequence counter is odd while a slot
+    is being written, and readers retry slots whose counter moved (seqlock).
+    Sessions idle for ``ttl`` seconds are evicted by periodic sweeps, and
+    when a key's window is full its least recently updated session is reused.
+    """
+
+    MAGIC = 0x43474C56
+    LAYOUT = 3
+    KEY_BYTES = 320
+    PROBE_SLOTS = 64
+    EMPTY, USED, DELETED = 0, 1, 2
+    HEADER = np.dtype([
+        ('magic', '<u4'), ('layout', '<u4'), ('slots', '<u4'), ('window', '<u4'), ('evicted', '<u8'),
+    ])
+
+    def __init__(self, name, slots, window, ttl):
+        # POSIX only, like the gunicorn deployment this backend is for
+        import fcntl
+        from multiprocessing import resource_tracker, shared_memory
+        self._fcntl = fcntl
+        self.name = name
+        self.slots = slots
+        self.window = window
+        self.ttl = ttl
+        self.dtype = np.dtype([
+            ('seq', '<u8'),
+            ('state', '<u4'),
+            ('hash', '<u4'),
+            ('meeting_hash', '<u4'),
+            ('head', '<u4'),
+            ('count', '<u4'),
+            ('last_seen', '<f8'),
+            ('sum', '<f8'),
+            ('key', f'S{self.KEY_BYTES}'),
+            ('values', '<f8', (window,)),
+        ])
+        self.size = self.HEADER.itemsize + slots * self.dtype.itemsize
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{name}.lock"), 'a+b')
+        # fcntl locks do not exclude threads of one process
+        self._thread_lock = threading.RLock()
+
+        with self._locked(0):
+            try:
+                self._shm = shared_memory.SharedMemory(name=name)
+                created = False
+            except FileNotFoundError:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=self.size)
+                created = True
+            # The segment outlives any one worker, so keep the resource
+            # tracker from unlinking it when this process exits.
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+            self._header = np.ndarray((1,), self.HEADER, self._shm.buf, 0)
+            if created:
+                self._header[0] = (self.MAGIC, self.LAYOUT, slots, window, 0)
+            elif tuple(self._header[0])[:4] != (self.MAGIC, self.LAYOUT, slots, window):
+                raise RuntimeError(
+                    f"Shared live state '{name}' has a different layout; remove "
+                    f"/dev/shm/{name} or set LIVE_STATE_NAME"
+                )
+        self._table = np.ndarray((slots,), self.dtype, self._shm.buf, self.HEADER.itemsize)
+        self._seq = self._table['seq']
+        self._state = self._table['state']
+        self._hash = self._table['hash']
+        self._meeting_hash = self._table['meeting_hash']
+        self._head = self._table['head']
+        self._count = self._table['count']
+        self._last_seen = self._table['last_seen']
+        self._sum = self._table['sum']
+        self._keys = self._table['key']
+        self._values = self._table['values']
+        self._probe = np.arange(min(slots, self.PROBE_SLOTS))
+        # key -> slot, checked under the slot lock before each write and
+        # pruned of slots freed since, so it never outgrows the table
+        self._slot_cache = {}
+        self._last_sweep = time.time()
+
+    @contextlib.contextmanager
+    def _locked(self, offset):
+        # Offset 0 guards the key index, offset i + 1 guards slot i
+        with self._thread_lock:
+            self._fcntl.lockf(self._lock_file, self._fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self._lock_file, self._fcntl.LOCK_UN, 1, offset)
+
+    def _window(self, key_hash):
+        return (key_hash + self._probe) % self.slots
+
+    def _find(self, key, key_hash):
+        """(slot holding key, first reusable slot in its probe window)"""
+        window = self._window(key_hash)
+        state = self._state[window]
+        candidates = window[(state == self.USED) & (self._hash[window] == key_hash)]
+        held = candidates[self._keys[candidates] == key]
+        if len(held):
+            return int(held[0]), None
+        # Freed slots anywhere in the window are reusable: the whole window
+        # is searched, so no probe chain depends on them
+        free = window[state != self.USED]
+        return None, int(free[0]) if len(free) else None
+
+    def _release(self, index):
+        # Caller holds the index lock
+        with self._locked(index + 1):
+            self._seq[index] += 1
+            self._state[index] = self.DELETED
+            self._seq[index] += 1
+        self._header['evicted'] += 1
+        self._slot_cache.pop(bytes(self._keys[index]), None)
+
+    def _claim(self, key, meeting_id, now):
+        key_hash = zlib.crc32(key)
+        with self._locked(0):
+            # Another worker may have claimed it since the unlocked probe
+            index, free = self._find(key, key_hash)
+            if index is not None:
+                return index
+            if free is None:
+                # Window full: reuse its least recently updated session
+                window = self._window(key_hash)
+                free = int(window[np.argmin(self._last_seen[window])])
+                self._release(free)
+            with self._locked(free + 1):
+                self._seq[free] += 1
+                self._keys[free] = key
+                self._hash[free] = key_hash
+                self._meeting_hash[free] = zlib.crc32(meeting_id.encode('utf-8'))
+                self._head[free] = 0
+                self._count[free] = 0
+                self._sum[free] = 0.0
+                self._last_seen[free] = now
+                # Publish the slot only once the key is in place
+                self._state[free] = self.USED
+                self._seq[free] += 1
+            return free
+
+    def record(self, meeting_id, user_email, attention):
+        """Add a score; returns the new window mean."""
+        key = f"{meeting_id}\x1f{user_email}".encode('utf-8')
+        if len(key) > self.KEY_BYTES:
+            # The score is still saved; it just cannot be shown live
+            count_event('live_state_errors')
+            logger.warning(
+                "Meeting %s user %s exceed the %d-byte shared live state key; not tracked live",
+                meeting_id[:64], user_email[:64], self.KEY_BYTES,
+            )
+            return None
+        now = time.time()
+        if now - self._last_sweep > min(self.ttl, 60):
+            self.evict(now)
+        while True:
+            index = self._slot_cache.get(key)
+            if index is None:
+                index, _ = self._find(key, zlib.crc32(key))
+                if index is None:
+                    index = self._claim(key, meeting_id, now)
+                if len(self._slot_cache) >= self.slots:
+                    self._slot_cache.clear()
+                self._slot_cache[key] = index
+            with self._locked(index + 1):
+                # The slot may have been evicted, or reused, since it was cached
+                if self._state[index] != self.USED or self._keys[index] != key:
+                    self._slot_cache.pop(key, None)
+                    continue
+                self._seq[index] += 1
+                head = int(self._head[index])
+                count = int(self._count[index])
+                total = float(self._sum[index])
+                if count == self.window:
+                    total -= float(self._values[index, head])
+                else:
+                    count += 1
+                self._values[index, head] = attention
+                head = (head + 1) % self.window
+                # Re-sum on each wrap so rounding error cannot build up
+                total = float(self._values[index, :count].sum()) if head == 0 else total + attention
+                self._head[index] = head
+                self._count[index] = count
+                self._sum[index] = total
+                self._last_seen[index] = now
+                self._seq[index] += 1
+                return total / count
+
+    def evict(self, now=None):
+        """Free the slots of sessions idle for more than ``ttl`` seconds."""
+        now = time.time() if now is None else now
+        self._last_sweep = now
+        # Other workers free slots too; forget the ones this worker cached
+        self._slot_cache = {
+            key: index for key, index in self._slot_cache.items()
+            if self._state[index] == self.USED and self._keys[index] == key
+        }
+        stale = np.flatnonzero((self._state == self.USED) & (self._last_seen < now - self.ttl))
+        if not len(stale):
+            return 0
+        evicted = 0
+        with self._locked(0):
+            for index in stale:
+                # Re-check: a frame may have arrived since the scan
+                if self._state[index] == self.USED and self._last_seen[index] < now - self.ttl:
+                    self._release(index)
+                    evicted += 1
+        return evicted
+
+    def _live_slots(self, meeting_id=None):
+        mask = (self._state == self.USED) & (self._last_seen >= time.time() - self.ttl)
+        if meeting_id is not None:
+            mask &= self._meeting_hash == zlib.crc32(meeting_id.encode('utf-8'))
+        return np.flatnonzero(mask)
+
+    def scores(self, meeting_id=None, retries=3):
+        """[(meeting_id, user_email, mean attention over the window)]"""
+        used = self._live_slots(meeting_id)
+        snapshot = self._table[used]
+        for attempt in range(retries + 1):
+            # Slots mid-write (odd) or rewritten during the copy are re-read,
+            # and skipped if they are still changing after the last retry
+            torn = (snapshot['seq'] % 2 == 1) | (snapshot['seq'] != self._seq[used])
+            if not torn.any():
+                break
+            if attempt == retries:
+                snapshot = snapshot[~torn]
+                break
+            snapshot[torn] = self._table[used[torn]]
+        result = []
+        for key, total, count, state in zip(snapshot['key'], snapshot['sum'], snapshot['count'], snapshot['state']):
+            if count and state == self.USED:
+                key_meeting, user_email = key.decode('utf-8').split('\x1f', 1)
+                # Meeting hashes can collide; the key is authoritative
+                if meeting_id is None or key_meeting == meeting_id:
+                    result.append((key_meeting, user_email, float(total / count)))
+        return result
+
+    def metrics(self):
+        live = self._live_slots()
+        return {
+            "backend": "shared",
+            "sessions": len(live),
+            "meetings": len(np.unique(self._meeting_hash[live])),
+            "capacity": self.slots,
+            "evicted": int(self._header['evicted'][0]),
+            "approx_bytes": self.size,
+        }
+
+class LiveStateManager(BaseManager):
+    pass
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def drop_proxy_connections(proxy):
+    """Forget the connections ``proxy`` shares with every other proxy for its server.
+
+    Proxies for one server address share a connection per thread, so after
+    the server restarts a new proxy would reuse the dead ones.
+    """
+    BaseProxy._address_to_local.pop(proxy._token.address, None)
+
+def serve_live_state():
+    """Run the key-value stand-in that multi-node deployments share."""
+    state = LocalLiveState(LIVE_STATE_WINDOW, LIVE_STATE_TTL, LIVE_STATE_MAX_SESSIONS)
+    LiveStateManager.register('live_state', callable=lambda: state)
+    manager = LiveStateManager(address=parse_address(LIVE_STATE_ADDRESS), authkey=LIVE_STATE_AUTHKEY)
+    logger.info("Serving live state on %s", LIVE_STATE_ADDRESS)
+    manager.get_server().serve_forever()
+
+class RemoteLiveState:
+    """Live state held by ``python main.py live-state-server``.
+
+    Each worker process connects on first use; calls are forwarded to the
+    server's LocalLiveState over the manager connection. A call that finds
+    the connection broken fails, and the next one reconnects, so a restarted
+    server is picked up without restarting the workers.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self._proxy = None
+        self._pid = None
+
+    def _remote(self):
+        if self._proxy is None or self._pid != os.getpid():
+            LiveStateManager.register('live_state')
+            manager = LiveStateManager(address=self.address, authkey=self.authkey)
+            manager.connect()
+            self._proxy = manager.live_state()
+            self._pid = os.getpid()
+        return self._proxy
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self._remote(), method)(*args)
+        except (EOFError, ConnectionError):
+            # Includes BrokenPipeError; the server went away, so reconnect next time
+            if self._proxy is not None:
+                drop_proxy_connections(self._proxy)
+                self._proxy = None
+            raise
+
+    def record(self, meeting_id, user_email, attention):
+        return self._call('record', meeting_id, user_email, float(attention))
+
+    def scores(self, meeting_id=None):
+        return self._call('scores', meeting_id)
+
+    def metrics(self):
+        return dict(self._call('metrics'), backend="manager")
+
+def load_live_state():
+    if LIVE_STATE_BACKEND == 'shared':
+        return SharedMemoryLiveState(LIVE_STATE_NAME, LIVE_STATE_SLOTS, LIVE_STATE_WINDOW, LIVE_STATE_TTL)
+    if LIVE_STATE_BACKEND == 'manager':
+        return RemoteLiveState(LIVE_STATE_ADDRESS, LIVE_STATE_AUTHKEY)
+    return LocalLiveState(LIVE_STATE_WINDOW, LIVE_STATE_TTL, LIVE_STATE_MAX_SESSIONS)
+
+live_state = load_live_state()
+
+# --- Live score push ---
+class LiveSubscriber:
+    """One /api/attention-stream client.
+
+    Only the newest score per (meeting, user) is kept until the client
+    reads it, so a slow client receives the latest values when it catches
+    up instead of a backlog of stale ones.
+    """
+
+    def __init__(self, meeting_id, user_email=None):
+        self.meeting_id = meeting_id
+        self.user_email = user_email
+        self.pending = {}
+        self.closed = False
+        self._wake = asyncio.Event()
+
+    def matches(self, meeting_id, user_email):
+        return meeting_id == self.meeting_id and self.user_email in (None, user_email)
+
+    def offer(self, meeting_id, user_email, score):
+        self.pending[(meeting_id, user_email)] = score
+        self._wake.set()
+
+    def close(self):
+        self.closed = True
+        self._wake.set()
+
+    async def next_updates(self, timeout):
+        """Wait up to ``timeout`` seconds; return the coalesced updates."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+        updates, self.pending = self.pending, {}
+        return updates
+
+class ScoreBroadcaster:
+    """Fans live score updates out to the subscribers of this worker.
+
+    Frames scored in this worker are published as soon as they are
+    recorded. With the shared and manager backends other workers score
+    frames too, so every ``interval`` seconds the live state of subscribed
+    meetings is read and scores that changed are published as well.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._subscribers = set()
+        self._published = {}
+        self._task = None
+
+    def publish(self, meeting_id, user_email, score):
+        # Clients see two decimals; skip updates that would not change them
+        score = round(score, 2)
+        subscribers = [s for s in self._subscribers if s.matches(meeting_id, user_email)]
+        if not subscribers or self._published.get((meeting_id, user_email)) == score:
+            return
+        self._published[(meeting_id, user_email)] = score
+        for subscriber in subscribers:
+            subscriber.offer(meeting_id, user_email, score)
+
+    def subscribe(self, meeting_id, user_email, scores):
+        subscriber = LiveSubscriber(meeting_id, user_email)
+        # Start from the current scores rather than waiting for a frame
+        for key_meeting, key_user, score in scores:
+            if subscriber.matches(key_meeting, key_user):
+                subscriber.offer(key_meeting, key_user, score)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+        # Only watched meetings need their last published scores
+        watched = self.watched_meetings()
+        self._published = {key: score for key, score in self._published.items() if key[0] in watched}
+
+    def watched_meetings(self):
+        return {subscriber.meeting_id for subscriber in self._subscribers}
+
+    @staticmethod
+    def read_scores(meetings):
+        # Runs on an executor thread; the manager backend is a network call
+        return [score for meeting_id in meetings for score in live_state.scores(meeting_id)]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._subscribers:
+                continue
+            try:
+                scores = await loop.run_in_executor(None, self.read_scores, self.watched_meetings())
+                for meeting_id, user_email, score in scores:
+                    self.publish(meeting_id, user_email, score)
+            except Exception:
+                logger.exception("Live score poll failed")
+
+    def start(self):
+        # In-process state has no other writers to poll for
+        if self._task is None and not isinstance(live_state, LocalLiveState):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Let open streams finish so shutdown does not wait on them
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+
+score_broadcaster = ScoreBroadcaster(LIVE_PUSH_INTERVAL)
+
+@app.on_event("startup")
+async def start_score_broadcaster():
+    score_broadcaster.start()
+
+@app.on_event("shutdown")
+async def stop_score_broadcaster():
+    await score_broadcaster.stop()
+
+async def track_live_attention(meeting_id, user_email, attention):
+    """Fold a saved score into the live state; a failure here only costs the live view."""
+    try:
+        if isinstance(live_state, RemoteLiveState):
+            # A network round-trip, kept off the event loop
+            score = await asyncio.get_running_loop().run_in_executor(
+                None, live_state.record, meeting_id, user_email, attention
+            )
+        else:
+            score = live_state.record(meeting_id, user_email, attention)
+    except Exception:
+        count_event('live_state_errors')
+        logger.exception("Live state update failed for meeting %s", meeting_id)
+        return
+    if score is not None:
+        score_broadcaster.publish(meeting_id, user_email, score)
+
+# --- Capture pacing ---
+class CapturePacer:
+    """Delay the extension should wait before a user's next capture.
+
+    Each steady frame (score within ``steady_delta`` of the user's previous
+    frame) stretches that user's interval by ``growth``, up to ``max_ms``. A
+    change drops it to ``min_ms``, so the change is followed closely. The
+    interval is then scaled by ingest_backlog() when that is over 1, which
+    spaces out every user's frames while detection is behind. Entries expire
+    after ``ttl`` seconds without frames.
+    """
+
+    def __init__(self, base_ms, min_ms, max_ms, steady_delta, growth, ttl):
+        self.base_ms = base_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.steady_delta = steady_delta
+        self.growth = growth
+        self.ttl = ttl
+        self._entries = {}
+        self._last_sweep = time.monotonic()
+
+    def next_interval(self, key, attention):
+        # attention is None when the frame was queued and no newer score has
+        # come back from the detection workers
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        previous = entry["attention"] if entry is not None else None
+        if entry is None:
+            interval = self.base_ms
+        elif attention is None or previous is None:
+            # Nothing new to compare
+            interval = entry["interval"]
+        elif abs(attention - previous) > self.steady_delta:
+            interval = self.min_ms
+        else:
+            interval = min(entry["interval"] * self.growth, self.max_ms)
+        if attention is None:
+            attention = previous
+        self._entries[key] = {"attention": attention, "interval": interval, "seen": now}
+        if now - self._last_sweep > self.ttl:
+            self.evict(now)
+        # The jitter keeps participants who joined together from capturing in lockstep
+        paced = interval * max(1.0, ingest_backlog()) * random.uniform(0.9, 1.1)
+        return int(min(max(paced, self.min_ms), self.max_ms))
+
+    def evict(self, now=None):
+        now = time.monotonic() if now is None else now
+        stale = [key for key, entry in self._entries.items() if now - entry["seen"] > self.ttl]
+        for key in stale:
+            del self._entries[key]
+        self._last_sweep = now
+        return len(stale)
+
+    def __len__(self):
+        return len(self._entries)
+
+capture_pacer = CapturePacer(
+    CAPTURE_INTERVAL_MS, CAPTURE_INTERVAL_MIN_MS, CAPTURE_INTERVAL_MAX_MS,
+    CAPTURE_STEADY_DELTA, CAPTURE_INTERVAL_GROWTH, TRACK_TTL_SECONDS,
+)
+
+def score_date(timestamp):
+    return parse_timestamp(timestamp).strftime('%Y-%m-%d')
+
+def write_records(conn, records):
+    """Write (meeting_id, user_email, timestamp, attention, reused) records.
+
+    History rows go in with one executemany. The daily running sums and the
+    per-minute rollups are folded in memory first, so each (meeting, user,
+    date) and (meeting, user, minute) costs a single upsert. Everything
+    commits in one transaction.
+    """
+    meeting_ids = lookup_ids(conn, 'meetings', [record[0] for record in records])
+    user_ids = lookup_ids(conn, 'users', [record[1] for record in records])
+    history = []
+    sums = {}
+    minutes = {}
+    for meeting_id, user_email, timestamp, attention, reused in records:
+        key = (meeting_ids[meeting_id], user_ids[user_email])
+        ts = to_epoch_ms(timestamp)
+        attention = float(attention)
+        history.append(key + (ts, attention, int(reused)))
+        # --- Per-minute rollup: [count, sum, min, max] ---
+        minute_key = key + (ts // MINUTE_MS * MINUTE_MS,)
+        rollup = minutes.get(minute_key)
+        if rollup is None:
+            minutes[minute_key] = [1, attention, attention, attention]
+        else:
+            rollup[0] += 1
+            rollup[1] += attention
+            rollup[2] = min(rollup[2], attention)
+            rollup[3] = max(rollup[3], attention)
+        # --- Running average per known user ---
         if user_email and user_email != "unknown":
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            today = timestamp.strftime('%Y-%m-%d')
-            now_iso = datetime.now().isoformat()
-            
-            # Try to update first
-            c.execute('''
-                SELECT attention_sum, attention_count FROM attention_scores
-                WHERE meeting_id=? AND user_email=? AND date=?
-            ''', (data.meetingId, user_email, today))
-            
-            row = c.fetchone()
-            if row:
-                new_sum = row[0] + float(attention)
-                new_count = row[1] + 1
-                avg = new_sum / new_count
-                c.execute('''
-                    UPDATE attention_scores
-                    SET attention=?, attention_sum=?, attention_count=?, updated_at=?
-                    WHERE meeting_id=? AND user_email=? AND date=?
-                ''', (avg, new_sum, new_count, now_iso, data.meetingId, user_email, today))
+            total = sums.setdefault(key + (score_date(timestamp),), [0.0, 0])
+            total[0] += attention
+            total[1] += 1
+    with conn:
+        conn.executemany(INSERT_HISTORY_SQL, history)
+        conn.executemany(UPSERT_MINUTE_SQL, [key + tuple(rollup) for key, rollup in minutes.items()])
+        for (meeting_ref, user_ref, date), (total, count) in sums.items():
+            upsert_score(conn, meeting_ref, user_ref, date, total, count)
+
+# --- Write-behind buffer ---
+class WriteBehindBuffer:
+    """Keeps scored frames in memory and writes them to SQLite in bulk.
+
+    Each flush is a single write_records() call, so history rows go in with
+    one executemany and each (meeting, user, date) costs a single upsert.
+    A flush runs when ``max_rows`` frames are buffered or
+    ``interval`` seconds have passed, whichever comes first, which bounds
+    what a crash can lose. Shutdown flushes whatever is left.
+    """
+
+    def __init__(self, max_rows, interval, max_pending):
+        self.max_rows = max_rows
+        self.interval = interval
+        self.max_pending = max_pending
+        self._rows = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    async def add(self, records):
+        # Backpressure: if the disk cannot keep up, make the caller wait
+        if len(self._rows) >= self.max_pending:
+            await self.flush()
+        self._rows.extend(records)
+        if len(self._rows) >= self.max_rows:
+            self._wake.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._rows:
+                return 0
+            rows, self._rows = self._rows, []
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write, rows)
+            except Exception:
+                # Put the frames back so the next flush retries them
+                self._rows[:0] = rows
+                raise
+            return len(rows)
+
+    def _write(self, rows):
+        with timed('db_flush'):
+            write_records(get_db(), rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; will retry")
+
+    def start(self):
+        if self._task is None:
+            # With preload_app this buffer is built in the gunicorn master, and
+            # Python 3.9 binds asyncio primitives to the loop current at
+            # creation, so make them again on the worker's own loop.
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+write_behind = WriteBehindBuffer(
+    WRITE_BEHIND_MAX_ROWS, WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_PENDING
+) if WRITE_BEHIND else None
+
+@app.on_event("startup")
+async def start_write_behind():
+    if write_behind is not None:
+        write_behind.start()
+
+@app.on_event("shutdown")
+async def stop_write_behind():
+    if write_behind is not None:
+        await write_behind.stop()
+
+async def save_attention(records):
+    """Persist (meeting_id, user_email, timestamp, attention, reused) records."""
+    if write_behind is not None:
+        await write_behind.add(records)
+        return
+    # History rows and running averages commit together
+    write_records(get_db(), records)
+
+async def process_frame(meeting_id, user_email, timestamp, image_bytes, pace=True):
+    """Score and save a frame. ``pace`` is off for detection workers, whose
+    scores reach capture pacing through the job queue instead."""
+    # Reject malformed timestamps before anything is written
+    parse_timestamp(timestamp)
+
+    # --- Attention detection, skipped for an unchanged frame ---
+    key = (meeting_id, user_email)
+    with timed('frame_check'):
+        result, signature = await check_frame_change(key, image_bytes)
+    reused = result is not None
+    if reused:
+        count_event('frames_reused')
+    else:
+        async with detection_slot(key):
+            # Includes the wait for a pool worker; the detection stages are timed inside
+            with timed('detection'):
+                result = await run_detection(image_bytes, tracking_hint(key))
+        count_event('frames_detected')
+        record_detection(key, signature, result)
+    # Only frames that got past admission count as meeting activity
+    meeting_registry.seen(meeting_id, user_email, timestamp)
+    attention = result["attention"]
+    # Persisted first, so the history keeps the score even if the live state is down
+    with timed('db_write'):
+        await save_attention([(meeting_id, user_email, timestamp, attention, reused)])
+
+    with timed('live_state'):
+        await track_live_attention(meeting_id, user_email, attention)
+
+    return {
+        "status": "success",
+        "message": "Image processed and not stored",
+        "attention": attention,
+        "reused": reused,
+        "next_capture_ms": capture_pacer.next_interval(key, attention) if pace else None
+    }
+
+# --- Detection job queue ---
+# With DETECTION_TIER=worker the web tier only validates frames and queues
+# them, and detection workers pull them and run process_frame(). Like the
+# admission queue, every backend keeps at most one waiting frame per
+# (meeting, user): a newer frame replaces it and keeps its place in line.
+# Jobs are {meeting_id, user_email, timestamp, image, enqueued}, enqueued
+# being wall-clock seconds so workers on other nodes can age them.
+class LocalJobQueue:
+    """Job queue in this process.
+
+    With JOB_QUEUE_BACKEND=local the web worker scores its own queue with an
+    in-process DetectionWorker. Also the object served by
+    ``python main.py job-queue-server``, where the manager calls it from
+    one thread per connection, hence the lock.
+    """
+
+    def __init__(self):
+        self._next_id = 0
+        # (meeting_id, user_email) -> id of the waiting job, oldest first
+        self._waiting = OrderedDict()
+        self._jobs = {}
+        # job id -> worker holding it
+        self._claimed = {}
+        # worker -> (last heartbeat, info)
+        self._workers = {}
+        # (meeting_id, user_email) -> (attention, reported), until the next put
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        """Queue a job; returns (whether it replaced a waiting one, the
+        user's score reported since their last put or None)."""
+        key = (job["meeting_id"], job["user_email"])
+        with self._lock:
+            score = self._scores.pop(key, (None, None))[0]
+            job_id = self._waiting.get(key)
+            if job_id is not None:
+                self._jobs[job_id] = job
+                return True, score
+            self._next_id += 1
+            self._waiting[key] = self._next_id
+            self._jobs[self._next_id] = job
+            return False, score
+
+    def take(self, worker, limit):
+        """Claim up to ``limit`` waiting jobs, oldest first: [(job_id, job)]."""
+        with self._lock:
+            taken = []
+            while self._waiting and len(taken) < limit:
+                _, job_id = self._waiting.popitem(last=False)
+                self._claimed[job_id] = worker
+                taken.append((job_id, self._jobs[job_id]))
+            return taken
+
+    def done(self, worker, job_ids, scores=()):
+        """Finish jobs; ``scores`` are the [(meeting_id, user_email, attention)]
+        they produced, handed to capture pacing by each user's next put."""
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                if self._claimed.get(job_id) == worker:
+                    del self._claimed[job_id]
+                    del self._jobs[job_id]
+            for meeting_id, user_email, attention in scores:
+                self._scores[(meeting_id, user_email)] = (attention, now)
+
+    def heartbeat(self, worker, info, dead_after):
+        """Mark ``worker`` alive and forget workers silent for ``dead_after``
+        seconds. Their claimed jobs are dropped, since they are stale by then;
+        returns how many."""
+        now = time.time()
+        with self._lock:
+            self._workers[worker] = (now, info)
+            # Scores of users who stopped sending frames
+            for key in [key for key, (_, reported) in self._scores.items() if now - reported > TRACK_TTL_SECONDS]:
+                del self._scores[key]
+            dead = {name for name, (seen, _) in self._workers.items() if now - seen > dead_after}
+            return self._forget(dead)
+
+    def leave(self, worker):
+        with self._lock:
+            self._forget({worker})
+
+    def _forget(self, workers):
+        for worker in workers:
+            self._workers.pop(worker, None)
+        lost = [job_id for job_id, worker in self._claimed.items() if worker in workers]
+        for job_id in lost:
+            del self._claimed[job_id]
+            del self._jobs[job_id]
+        return len(lost)
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            enqueued = [self._jobs[job_id]["enqueued"] for job_id in self._waiting.values()]
+            return {
+                "backend": "local",
+                "waiting": len(self._waiting),
+                "claimed": len(self._claimed),
+                "oldest_age": now - min(enqueued) if enqueued else None,
+                "workers": [
+                    dict(info, worker=worker, last_seen=now - seen)
+                    for worker, (seen, info) in self._workers.items()
+                ],
+            }
+
+class SqliteJobQueue:
+    """Job queue in a SQLite file that every process on the host opens.
+
+    Kept out of DB_PATH so queue churn never waits on score writes. A lost
+    job only costs one frame that the next capture replaces, so the file
+    runs with synchronous=OFF. Claims run in BEGIN IMMEDIATE transactions,
+    so two workers never take the same job.
+    """
+
+    SCHEMA_SQL = '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            meeting_id TEXT NOT NULL,
+            user_email TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            image BLOB NOT NULL,
+            enqueued REAL NOT NULL,
+            worker TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_waiting ON jobs (meeting_id, user_email) WHERE worker IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_jobs_worker ON jobs (worker) WHERE worker IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS workers (
+            worker TEXT PRIMARY KEY,
+            seen REAL NOT NULL,
+            info TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS scores (
+            meeting_id TEXT NOT NULL,
+            user_email TEXT NOT NULL,
+            attention REAL NOT NULL,
+            reported REAL NOT NULL,
+            PRIMARY KEY (meeting_id, user_email)
+        );
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA_SQL)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        # Like get_db(): one connection per thread, reopened after a fork
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def put(self, job):
+        key = (job["meeting_id"], job["user_email"])
+        with self._transaction() as conn:
+            score = conn.execute('SELECT attention FROM scores WHERE meeting_id = ? AND user_email = ?', key).fetchone()
+            if score is not None:
+                conn.execute('DELETE FROM scores WHERE meeting_id = ? AND user_email = ?', key)
+            waiting = conn.execute(
+                'SELECT id FROM jobs WHERE meeting_id = ? AND user_email = ? AND worker IS NULL', key,
+            ).fetchone()
+            if waiting is not None:
+                conn.execute(
+                    'UPDATE jobs SET timestamp = ?, image = ?, enqueued = ? WHERE id = ?',
+                    (job["timestamp"], job["image"], job["enqueued"], waiting[0]),
+                )
             else:
-                c.execute('''
-                    INSERT INTO attention_scores (meeting_id, user_email, date, attention, updated_at, attention_sum, attention_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (data.meetingId, user_email, today, float(attention), now_iso, float(attention), 1))
-            
-            conn.commit()
-            conn.close()
-        
+                conn.execute(
+                    'INSERT INTO jobs (meeting_id, user_email, timestamp, image, enqueued) VALUES (?, ?, ?, ?, ?)',
+                    (job["meeting_id"], job["user_email"], job["timestamp"], job["image"], job["enqueued"]),
+                )
+        return waiting is not None, score[0] if score is not None else None
+
+    def take(self, worker, limit):
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT id, meeting_id, user_email, timestamp, image, enqueued FROM jobs '
+                'WHERE worker IS NULL ORDER BY id LIMIT ?', (limit,),
+            ).fetchall()
+            conn.executemany('UPDATE jobs SET worker = ? WHERE id = ?', [(worker, row[0]) for row in rows])
+        return [
+            (job_id, {"meeting_id": meeting_id, "user_email": user_email, "timestamp": timestamp,
+                      "image": image, "enqueued": enqueued})
+            for job_id, meeting_id, user_email, timestamp, image, enqueued in rows
+        ]
+
+    def done(self, worker, job_ids, scores=()):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM jobs WHERE id = ? AND worker = ?', [(job_id, worker) for job_id in job_ids])
+            conn.executemany(
+                'INSERT INTO scores (meeting_id, user_email, attention, reported) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(meeting_id, user_email) DO UPDATE SET attention = excluded.attention, reported = excluded.reported',
+                [(meeting_id, user_email, attention, now) for meeting_id, user_email, attention in scores],
+            )
+
+    def heartbeat(self, worker, info, dead_after):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO workers (worker, seen, info) VALUES (?, ?, ?) '
+                'ON CONFLICT(worker) DO UPDATE SET seen = excluded.seen, info = excluded.info',
+                (worker, now, json.dumps(info)),
+            )
+            lost = conn.execute(
+                'DELETE FROM jobs WHERE worker IN (SELECT worker FROM workers WHERE seen < ?)',
+                (now - dead_after,),
+            ).rowcount
+            conn.execute('DELETE FROM workers WHERE seen < ?', (now - dead_after,))
+            conn.execute('DELETE FROM scores WHERE reported < ?', (now - TRACK_TTL_SECONDS,))
+        return lost
+
+    def leave(self, worker):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM jobs WHERE worker = ?', (worker,))
+            conn.execute('DELETE FROM workers WHERE worker = ?', (worker,))
+
+    def status(self):
+        now = time.time()
+        conn = self._conn()
+        waiting, oldest = conn.execute('SELECT COUNT(*), MIN(enqueued) FROM jobs WHERE worker IS NULL').fetchone()
+        claimed = conn.execute('SELECT COUNT(*) FROM jobs WHERE worker IS NOT NULL').fetchone()[0]
+        workers = conn.execute('SELECT worker, seen, info FROM workers').fetchall()
+        return {
+            "backend": "sqlite",
+            "waiting": waiting,
+            "claimed": claimed,
+            "oldest_age": now - oldest if oldest is not None else None,
+            "workers": [dict(json.loads(info), worker=worker, last_seen=now - seen) for worker, seen, info in workers],
+        }
+
+class JobQueueManager(BaseManager):
+    pass
+
+def serve_job_queue():
+    """Run the broker stand-in that web and detection workers on several nodes share."""
+    queue = LocalJobQueue()
+    JobQueueManager.register('job_queue', callable=lambda: queue)
+    manager = JobQueueManager(address=parse_address(JOB_QUEUE_ADDRESS), authkey=JOB_QUEUE_AUTHKEY)
+    logger.info("Serving the detection job queue on %s", JOB_QUEUE_ADDRESS)
+    manager.get_server().serve_forever()
+
+class RemoteJobQueue:
+    """Job queue held by ``python main.py job-queue-server``.
+
+    Each process connects on first use; calls are forwarded to the server's
+    LocalJobQueue over the manager connection. Like RemoteLiveState, a call
+    that finds the connection broken fails and the next one reconnects.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self._proxy = None
+        self._pid = None
+
+    def _remote(self):
+        if self._proxy is None or self._pid != os.getpid():
+            JobQueueManager.register('job_queue')
+            manager = JobQueueManager(address=self.address, authkey=self.authkey)
+            manager.connect()
+            self._proxy = manager.job_queue()
+            self._pid = os.getpid()
+        return self._proxy
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self._remote(), method)(*args)
+        except (EOFError, ConnectionError):
+            # Includes BrokenPipeError; the server went away, so reconnect next time
+            if self._proxy is not None:
+                drop_proxy_connections(self._proxy)
+                self._proxy = None
+            raise
+
+    def put(self, job):
+        return self._call('put', job)
+
+    def take(self, worker, limit):
+        return self._call('take', worker, limit)
+
+    def done(self, worker, job_ids, scores=()):
+        self._call('done', worker, job_ids, list(scores))
+
+    def heartbeat(self, worker, info, dead_after):
+        return self._call('heartbeat', worker, info, dead_after)
+
+    def leave(self, worker):
+        self._call('leave', worker)
+
+    def status(self):
+        return dict(self._call('status'), backend="manager")
+
+def load_job_queue():
+    if DETECTION_TIER == 'web':
+        return None
+    if DETECTION_TIER != 'worker':
+        raise ValueError(f"Unknown DETECTION_TIER: {DETECTION_TIER}")
+    if JOB_QUEUE_BACKEND == 'local':
+        return LocalJobQueue()
+    if JOB_QUEUE_BACKEND == 'sqlite':
+        return SqliteJobQueue(JOB_QUEUE_PATH)
+    if JOB_QUEUE_BACKEND == 'manager':
+        return RemoteJobQueue(JOB_QUEUE_ADDRESS, JOB_QUEUE_AUTHKEY)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {JOB_QUEUE_BACKEND}")
+
+job_queue = load_job_queue()
+
+# job_queue.status() as last read by this process, and the read in progress;
+# pacing reads the cached copy per frame
+_job_status = {"at": 0.0, "status": None, "refresh": None}
+
+async def _refresh_job_status():
+    try:
+        # The sqlite and manager queues block; keep them off the event loop
+        status = await asyncio.get_running_loop().run_in_executor(None, job_queue.status)
+        _job_status.update(at=time.monotonic(), status=status)
+        return status
+    finally:
+        _job_status["refresh"] = None
+
+async def job_queue_status():
+    """job_queue.status(), read at most once a second."""
+    if _job_status["status"] is not None and time.monotonic() - _job_status["at"] <= 1.0:
+        return _job_status["status"]
+    # Concurrent requests share one read, which outlives any one of them
+    if _job_status["refresh"] is None:
+        _job_status["refresh"] = asyncio.ensure_future(_refresh_job_status())
+    return await asyncio.shield(_job_status["refresh"])
+
+def live_workers(status):
+    return [worker for worker in status["workers"] if worker["last_seen"] <= 3 * WORKER_HEARTBEAT_INTERVAL]
+
+def job_retry_after(status, workers):
+    """Whole seconds the live workers need for the waiting jobs, at their measured rate."""
+    rate = sum(worker["processed"] / worker["busy_seconds"] for worker in workers if worker["busy_seconds"] > 0)
+    if not rate:
+        return max(1, math.ceil(WORKER_HEARTBEAT_INTERVAL))
+    return max(1, math.ceil(status["waiting"] / rate))
+
+async def queue_frame(meeting_id, user_email, timestamp, image_bytes):
+    """Queue a frame for the detection workers; returns the user's score
+    they reported since the user's last queued frame, or None."""
+    try:
+        status = await job_queue_status()
+        workers = live_workers(status)
+        if not workers:
+            raise FrameDropped(503, "No detection workers are running", max(1, math.ceil(WORKER_HEARTBEAT_INTERVAL)))
+        if status["waiting"] >= JOB_QUEUE_MAX_DEPTH:
+            count_event('frames_rejected')
+            raise FrameDropped(503, "Detection queue is full", job_retry_after(status, workers))
+        with timed('enqueue'):
+            replaced, attention = await asyncio.get_running_loop().run_in_executor(None, job_queue.put, {
+                "meeting_id": meeting_id,
+                "user_email": user_email,
+                "timestamp": timestamp,
+                "image": bytes(image_bytes),
+                "enqueued": time.time(),
+            })
+    except (EOFError, ConnectionError) as e:
+        # The job-queue-server is down or restarting; the next call reconnects
+        logger.warning("Job queue unavailable: %r", e)
+        raise FrameDropped(503, "Detection queue is unavailable", max(1, math.ceil(WORKER_HEARTBEAT_INTERVAL))) from None
+    if replaced:
+        count_event('frames_superseded')
+    return attention
+
+async def enqueue_frame(meeting_id, user_email, timestamp, image_bytes):
+    attention = await queue_frame(meeting_id, user_email, timestamp, image_bytes)
+    return {
+        "status": "queued",
+        "message": "Image queued for detection",
+        # Paced on the user's last score the detection workers reported
+        "next_capture_ms": capture_pacer.next_interval((meeting_id, user_email), attention)
+    }
+
+async def accept_frame(meeting_id, user_email, timestamp, image_bytes):
+    """Score a frame here, or queue it when the worker tier scores frames."""
+    if job_queue is None:
+        return await process_frame(meeting_id, user_email, timestamp, image_bytes)
+    # Reject malformed timestamps before the frame is queued
+    parse_timestamp(timestamp)
+    return await enqueue_frame(meeting_id, user_email, timestamp, image_bytes)
+
+class DetectionWorker:
+    """Pulls queued frames and scores them with process_frame().
+
+    Claims up to ``batch_size`` jobs at a time and scores them together, so
+    the detection pool stays busy, then marks them done. A job that waited
+    longer than ``deadline`` seconds is dropped unscored, since the user's
+    next frame replaces it. Every ``heartbeat_interval`` seconds the worker
+    reports its counters to the queue; a worker that misses three
+    heartbeats is presumed dead, and the jobs it holds are dropped.
+    """
+
+    def __init__(self, queue, batch_size, deadline, heartbeat_interval, poll_interval):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.deadline = deadline
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+        self.expired = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def info(self):
         return {
-            "status": "success",
-            "message": "Image processed and not stored",
-            "attention": attention
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "slots": admission.slots if admission is not None else detection_pool_size(),
+            "processed": self.processed,
+            "expired": self.expired,
+            "failed": self.failed,
+            "busy_seconds": self.busy_seconds,
         }
+
+    async def _call(self, method, *args):
+        # The sqlite and manager queues block; keep them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def _heartbeats(self, stop):
+        # A task of its own, so a slow batch never makes the worker look dead
+        while not stop.is_set():
+            try:
+                lost = await self._call(self.queue.heartbeat, self.name, self.info(), 3 * self.heartbeat_interval)
+                if lost:
+                    logger.warning("Dropped %d frames held by detection workers that stopped", lost)
+            except Exception:
+                logger.exception("Detection worker heartbeat failed")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.heartbeat_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def score(self, job):
+        """The job's attention score, or None when it was not scored."""
+        if time.time() - job["enqueued"] > self.deadline:
+            self.expired += 1
+            count_event('frames_expired')
+            return None
+        try:
+            result = await process_frame(job["meeting_id"], job["user_email"], job["timestamp"], job["image"], pace=False)
+            self.processed += 1
+            return result["attention"]
+        except FrameDropped:
+            # Expired waiting for a slot in this worker; already counted
+            self.expired += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("Detection job for %s/%s failed", job["meeting_id"], job["user_email"])
+
+    async def run(self, stop):
+        """Score jobs until ``stop`` is set, finishing the claimed batch first."""
+        heartbeats = asyncio.get_running_loop().create_task(self._heartbeats(stop))
+        try:
+            while not stop.is_set():
+                try:
+                    jobs = await self._call(self.queue.take, self.name, self.batch_size)
+                except Exception:
+                    logger.exception("Job queue unavailable; retrying")
+                    jobs = []
+                if not jobs:
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                start = time.perf_counter()
+                scores = await asyncio.gather(*(self.score(job) for _, job in jobs))
+                self.busy_seconds += time.perf_counter() - start
+                try:
+                    # The scores go back to the web tier for capture pacing
+                    await self._call(self.queue.done, self.name, [job_id for job_id, _ in jobs], [
+                        (job["meeting_id"], job["user_email"], attention)
+                        for (_, job), attention in zip(jobs, scores) if attention is not None
+                    ])
+                except Exception:
+                    # The frames are saved; a restarted queue has forgotten the jobs anyway
+                    logger.exception("Could not mark detection jobs done")
+        finally:
+            heartbeats.cancel()
+            try:
+                await heartbeats
+            except asyncio.CancelledError:
+                pass
+            try:
+                await self._call(self.queue.leave, self.name)
+            except Exception:
+                logger.exception("Could not leave the job queue")
+
+def load_detection_worker():
+    return DetectionWorker(
+        job_queue, JOB_BATCH_SIZE or detection_pool_size(), ADMISSION_DEADLINE,
+        WORKER_HEARTBEAT_INTERVAL, JOB_POLL_INTERVAL,
+    )
+
+@app.on_event("startup")
+async def start_local_detection_worker():
+    # Nothing outside this process can reach a local queue
+    if isinstance(job_queue, LocalJobQueue):
+        _local_worker["stop"] = asyncio.Event()
+        _local_worker["task"] = asyncio.get_running_loop().create_task(
+            load_detection_worker().run(_local_worker["stop"])
+        )
+
+async def run_detection_worker():
+    """``python main.py detection-worker``: score queued frames until SIGINT/SIGTERM."""
+    if not isinstance(job_queue, (SqliteJobQueue, RemoteJobQueue)):
+        raise SystemExit("detection-worker needs DETECTION_TIER=worker and JOB_QUEUE_BACKEND=sqlite or manager")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    # Same startup as a web worker: detection pool, registry and write-behind flushes
+    await app.router.startup()
+    worker = load_detection_worker()
+    logger.info("Detection worker %s scoring frames from the %s job queue", worker.name, JOB_QUEUE_BACKEND)
+    try:
+        await worker.run(stop)
+    finally:
+        await app.router.shutdown()
+
+@app.post("/api/images")
+async def receive_image(data: ImageData):
+    try:
+        with timed('request'):
+            with timed('payload_decode'):
+                image_bytes = decode_image_payload(data.imageData)
+
+            # Get user email - prioritize userId, fallback to userName
+            user_email = data.userId or data.userName or "unknown"
+
+            return await accept_frame(data.meetingId, user_email, data.timestamp, image_bytes)
+    except FrameDropped as e:
+        raise e.as_http_exception()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/images/raw")
+async def receive_raw_image(
+    request: Request,
+    meetingId: Optional[str] = Query(None),
+    timestamp: Optional[str] = Query(None),
+    userId: Optional[str] = Query(None),
+    userName: Optional[str] = Query(None),
+):
+    """Raw JPEG upload: the body is the encoded image (application/octet-stream)
+    or a multipart form with an ``image`` file part. Metadata comes from the
+    query string, falling back to X-Meeting-Id / X-Timestamp / X-User-Id headers."""
+    headers = request.headers
+    meeting_id = meetingId or headers.get('x-meeting-id')
+    timestamp = timestamp or headers.get('x-timestamp')
+    if not meeting_id or not timestamp:
+        raise HTTPException(status_code=422, detail="meetingId and timestamp are required")
+    user_email = userId or headers.get('x-user-id') or userName or headers.get('x-user-name') or "unknown"
+
+    if headers.get('content-type', '').startswith('multipart/form-data'):
+        form = await request.form()
+        upload = form.get('image')
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="multipart upload needs an 'image' file part")
+        image_bytes = await upload.read()
+    else:
+        # The request body buffer goes to cv2.imdecode as-is (np.frombuffer does not copy)
+        image_bytes = await request.body()
+    if not image_bytes:
+        raise HTTPException(status_code=422, detail="Empty image body")
+
+    try:
+        with timed('request'):
+            return await accept_frame(meeting_id, user_email, timestamp, image_bytes)
+    except FrameDropped as e:
+        raise e.as_http_exception()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/images/batch")
+async def receive_image_batch(batch: ImageBatch):
+    with timed('request'):
+        if len(batch.frames) > MAX_BATCH_FRAMES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_FRAMES} frames")
+
+        # Validate and decode every frame up front; a bad frame only fails itself
+        results = [None] * len(batch.frames)
+        pending = []
+        for index, frame in enumerate(batch.frames):
+            try:
+                with timed('payload_decode'):
+                    image_bytes = decode_image_payload(frame.imageData)
+                parse_timestamp(frame.timestamp)
+            except Exception as e:
+                results[index] = {"index": index, "status": "error", "detail": str(e)}
+                continue
+            user_email = frame.userId or frame.userName or "unknown"
+            pending.append((index, frame, user_email, image_bytes))
+
+        if job_queue is not None:
+            # Queued frames of one user replace each other; the newest gets scored.
+            # A refused frame only fails itself, so the client never resends
+            # frames that were already queued.
+            dropped = []
+            # (meeting, user) -> score the workers reported, which only a
+            # user's first queued frame in the batch can pick up
+            reported = {}
+            for index, frame, user_email, image_bytes in pending:
+                try:
+                    attention = await queue_frame(frame.meetingId, user_email, frame.timestamp, image_bytes)
+                except FrameDropped as e:
+                    dropped.append(e)
+                    results[index] = {"index": index, "status": "dropped", "detail": str(e)}
+                    continue
+                results[index] = {"index": index, "status": "queued"}
+                last_queued = (frame.meetingId, user_email)
+                if reported.get(last_queued) is None:
+                    reported[last_queued] = attention
+            if dropped and not reported:
+                # Nothing was queued: shed the request as /api/images would
+                raise dropped[-1].as_http_exception()
+            # One pacing step per user however many of their frames the batch holds
+            hints = {key: capture_pacer.next_interval(key, attention) for key, attention in reported.items()}
+            next_capture_ms = hints[last_queued] if reported else None
+            if dropped:
+                next_capture_ms = max(next_capture_ms, dropped[-1].retry_after * 1000)
+            return {"status": "success", "results": results, "next_capture_ms": next_capture_ms}
+
+        try:
+            # Frames are compared with each user's last detected frame from
+            # before this batch; only the changed ones go to detection.
+            with timed('frame_check'):
+                checks = await asyncio.gather(*[
+                    check_frame_change((item[1].meetingId, item[2]), item[3]) for item in pending
+                ])
+            changed = [position for position, (cached, _) in enumerate(checks) if cached is None]
+            detections = []
+            if changed:
+                # The batch waits in line as one frame, that of its newest changed
+                # frame's user, and spreads over no more pool workers than the
+                # slots it then holds
+                _, newest, newest_user, _ = pending[changed[-1]]
+                async with detection_slot((newest.meetingId, newest_user), len(changed)) as held:
+                    with timed('detection'):
+                        detections = await run_detection_batch(
+                            [pending[position][3] for position in changed],
+                            [tracking_hint((pending[position][1].meetingId, pending[position][2])) for position in changed],
+                            held,
+                        )
+            count_event('frames_detected', len(changed))
+            count_event('frames_reused', len(pending) - len(changed))
+            detected = dict(zip(changed, detections))
+            scores = []
+            for position, (index, frame, user_email, _) in enumerate(pending):
+                result = detected.get(position)
+                if result is None:
+                    scores.append((checks[position][0]["attention"], True))
+                    continue
+                record_detection((frame.meetingId, user_email), checks[position][1], result)
+                scores.append((result["attention"], False))
+
+            with timed('db_write'):
+                await save_attention([
+                    (frame.meetingId, user_email, frame.timestamp, attention, reused)
+                    for (index, frame, user_email, _), (attention, reused) in zip(pending, scores)
+                ])
+
+            # (meeting, user) -> score of their newest frame in the batch
+            newest = {}
+            for (index, frame, user_email, _), (attention, _) in zip(pending, scores):
+                meeting_registry.seen(frame.meetingId, user_email, frame.timestamp)
+                with timed('live_state'):
+                    await track_live_attention(frame.meetingId, user_email, attention)
+                newest[(frame.meetingId, user_email)] = attention
+            # One pacing step per user however many of their frames the batch holds
+            hints = {key: capture_pacer.next_interval(key, attention) for key, attention in newest.items()}
+            next_capture_ms = hints[(pending[-1][1].meetingId, pending[-1][2])] if pending else None
+            for (index, frame, user_email, _), (attention, reused) in zip(pending, scores):
+                results[index] = {"index": index, "status": "success", "attention": attention, "reused": reused}
+        except FrameDropped as e:
+            raise e.as_http_exception()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        # Paced by the newest frame; a batch normally holds one user's queued frames
+        return {"status": "success", "results": results, "next_capture_ms": next_capture_ms}
+
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "pid": os.getpid()}
+
+@app.get("/api/capture-config")
+async def capture_config():
+    """How the extension should capture frames for this server."""
+    return {
+        "width": CAPTURE_WIDTH,
+        "grayscale": CAPTURE_GRAYSCALE,
+        "format": f"image/{CAPTURE_FORMAT}",
+        "quality": CAPTURE_QUALITY,
+        "interval_ms": CAPTURE_INTERVAL_MS,
+    }
 
 @app.get("/api/attention")
-async def get_attention_scores():
+async def get_attention_scores(meeting_id: Optional[str] = Query(None)):
     result = []
-    user_emails = getattr(receive_image, 'user_emails', {})
-    
-    for (meetingId, userEmail), history in ATTENTION_HISTORY.items():
-        if history:
-            avg_attention = sum(history) / len(history)
-        else:
-            avg_attention = 0.0
-        
+    for meetingId, userEmail, avg_attention in live_state.scores(meeting_id):
         result.append({
             "meetingId": meetingId,
             "userEmail": userEmail,
@@ -297,6 +3066,104 @@ async def get_attention_scores():
     
     return result
 
+@app.get("/api/live-state")
+async def live_state_metrics():
+    """Size and eviction counters of the live score state."""
+    return live_state.metrics()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms and frame, face and eye counters."""
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
+
+def require_profiler():
+    if not PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (set PROFILER=1)")
+
+@app.post("/api/profiler/start")
+async def start_profiler(interval: float = Query(PROFILER_INTERVAL, gt=0, le=1)):
+    """Start sampling this worker's stacks; samples add up until reset."""
+    require_profiler()
+    stack_sampler.start(interval)
+    return {"pid": os.getpid(), "running": True, "interval": stack_sampler.interval}
+
+@app.post("/api/profiler/stop")
+async def stop_profiler():
+    require_profiler()
+    await asyncio.get_running_loop().run_in_executor(None, stack_sampler.stop)
+    return {"pid": os.getpid(), "running": False, "samples": stack_sampler.samples}
+
+@app.get("/api/profiler", response_class=PlainTextResponse)
+async def profiler_stacks(reset: bool = Query(False)):
+    """Sampled stacks in folded format, for flamegraph.pl or speedscope."""
+    require_profiler()
+    folded = stack_sampler.folded()
+    if reset:
+        stack_sampler.reset()
+    return PlainTextResponse(folded, headers={"X-Worker-Pid": str(os.getpid())})
+
+@app.get("/api/frame-skip")
+async def frame_skip_metrics():
+    """Detection work this worker avoided by reusing scores of unchanged frames."""
+    if frame_changes is None:
+        return {"enabled": False}
+    return {"enabled": True, **frame_changes.metrics()}
+
+@app.get("/api/admission")
+async def admission_metrics():
+    """Detection slots, waiting frames and shed frames of this worker."""
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission.metrics()}
+
+@app.get("/api/jobs")
+async def job_queue_metrics():
+    """Depth of the detection job queue and the heartbeats of its workers."""
+    if job_queue is None:
+        return {"enabled": False}
+    status = await asyncio.get_running_loop().run_in_executor(None, job_queue.status)
+    for worker in status["workers"]:
+        worker["alive"] = worker["last_seen"] <= 3 * WORKER_HEARTBEAT_INTERVAL
+    return {"enabled": True, **status}
+
+@app.get("/api/attention-stream")
+async def stream_attention(request: Request, meeting_id: str = Query(...), user_email: Optional[str] = Query(None)):
+    """Server-Sent Events: live scores of a meeting (or one of its users).
+
+    Each event is an /api/attention item, sent when that user's rolling
+    score changes. Updates a client has not read yet are coalesced to the
+    newest score per user.
+    """
+    scores = await asyncio.get_running_loop().run_in_executor(None, live_state.scores, meeting_id)
+    subscriber = score_broadcaster.subscribe(meeting_id, user_email, scores)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.closed:
+                updates = await subscriber.next_updates(LIVE_PUSH_KEEPALIVE)
+                if await request.is_disconnected():
+                    break
+                if not updates:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(
+                    "data: " + json.dumps({
+                        "meetingId": key_meeting,
+                        "userEmail": key_user,
+                        "attention_score": round(score, 2),
+                    }) + "\n\n"
+                    for (key_meeting, key_user), score in updates.items()
+                )
+        finally:
+            score_broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/db-attention", response_class=HTMLResponse)
 async def db_attention_page():
     return """
@@ -444,6 +3311,22 @@ async def db_attention_page():
                 color: #666;
                 font-style: italic;
             }
+            #live {
+                margin-top: 2rem;
+            }
+            #live h3 {
+                display: flex;
+                align-items: center;
+                gap: 0.5rem;
+                color: #2c3e50;
+            }
+            #live h3::before {
+                content: '';
+                width: 10px;
+                height: 10px;
+                border-radius: 50%;
+                background: #2ecc71;
+            }
 
             /* Modal styles */
             .modal {
@@ -548,6 +3431,7 @@ async def db_attention_page():
                 <button type='submit'>Search</button>
             </form>
             <div id='results'></div>
+            <div id='live'></div>
         </div>
         <!-- Modal for graph -->
         <div id="graphModal" class="modal">
@@ -561,10 +3445,45 @@ async def db_attention_page():
         </div>
         <script>
         let chartInstance = null;
+
+        // Live panel: scores pushed by /api/attention-stream for the searched meeting
+        let liveStream = null;
+        let liveRenderPending = false;
+        const liveScores = new Map();
+        function renderLive() {
+            liveRenderPending = false;
+            const live = document.getElementById('live');
+            if (!liveScores.size) {
+                live.innerHTML = '';
+                return;
+            }
+            let html = `<h3>Live</h3><table><tr><th>User Email</th><th>Live Attention (%)</th></tr>`;
+            for (const [email, score] of [...liveScores].sort()) {
+                html += `<tr><td>${email}</td><td>${(score * 100).toFixed(0)}</td></tr>`;
+            }
+            live.innerHTML = html + '</table>';
+        }
+        function watchMeeting(meetId) {
+            if (liveStream) liveStream.close();
+            liveScores.clear();
+            renderLive();
+            liveStream = new EventSource(`/api/attention-stream?meeting_id=${encodeURIComponent(meetId)}`);
+            liveStream.onmessage = function(event) {
+                const update = JSON.parse(event.data);
+                liveScores.set(update.userEmail, update.attention_score);
+                // One redraw per frame however many updates arrive
+                if (!liveRenderPending) {
+                    liveRenderPending = true;
+                    requestAnimationFrame(renderLive);
+                }
+            };
+        }
+
         document.getElementById('meet-form').onsubmit = async function(e) {
             e.preventDefault();
             const meetId = document.getElementById('meeting-id').value.trim();
             if (!meetId) return;
+            watchMeeting(meetId);
             document.getElementById('results').innerHTML = 'Loading...';
             const dataUrl = `${window.location.origin}/api/db-attention-data?meeting_id=${encodeURIComponent(meetId)}`;
             try {
@@ -613,7 +3532,7 @@ async def db_attention_page():
             const chartCanvas = document.getElementById('attentionChart');
             if (chartInstance) { chartInstance.destroy(); chartInstance = null; }
             
-            const url = `/api/attention-history?meeting_id=${encodeURIComponent(meetingId)}&user_email=${encodeURIComponent(userEmail)}`;
+            const url = `/api/attention-history?meeting_id=${encodeURIComponent(meetingId)}&user_email=${encodeURIComponent(userEmail)}&max_points=500`;
             const resp = await fetch(url);
             const data = await resp.json();
             
@@ -681,11 +3600,15 @@ async def db_attention_page():
 
 @app.get("/api/db-attention-data", response_class=JSONResponse)
 async def db_attention_data(meeting_id: str = Query(...)):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT user_email, attention_sum, attention_count FROM attention_scores WHERE meeting_id=?", (meeting_id,))
-    rows = c.fetchall()
-    conn.close()
+    conn = get_db()
+    rows = conn.execute(
+        """SELECT u.email, s.attention_sum, s.attention_count
+           FROM meetings m
+           JOIN attention_scores s ON s.meeting_id = m.id
+           JOIN users u ON u.id = s.user_id
+           WHERE m.name=?""",
+        (meeting_id,)
+    ).fetchall()
     result = [
         {
             "user_email": row[0],
@@ -697,33 +3620,394 @@ async def db_attention_data(meeting_id: str = Query(...)):
 
 @app.get("/api/db-attention-score", response_class=JSONResponse)
 async def db_attention_score(meeting_id: str = Query(...), user_email: str = Query(...)):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT attention_sum, attention_count FROM attention_scores WHERE meeting_id=? AND user_email=?",
+    conn = get_db()
+    row = conn.execute(
+        """SELECT s.attention_sum, s.attention_count
+           FROM meetings m, users u
+           JOIN attention_scores s ON s.meeting_id = m.id AND s.user_id = u.id
+           WHERE m.name=? AND u.email=?""",
         (meeting_id, user_email)
-    )
-    row = c.fetchone()
-    conn.close()
+    ).fetchone()
     if row and row[1]:
         attention_percent = (row[0] / row[1]) * 100
     else:
         attention_percent = 0.0
     return {"user_email": user_email, "attention_percent": attention_percent}
 
+# --- History downsampling ---
+# Upper bound for one page of /api/attention-history
+MAX_HISTORY_PAGE = 10000
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y, ...) tuples.
+
+    The first and last points are always kept. The points in between are
+    split into ``threshold - 2`` equal buckets and from each the point that
+    forms the largest triangle with the last kept point and the mean of the
+    next bucket is chosen, so peaks and dips survive the reduction.
+    """
+    n = len(points)
+    if threshold < 3 or n <= threshold:
+        return list(points)
+    every = (n - 2) / (threshold - 2)
+    sampled = [points[0]]
+    a = points[0]
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Mean of the following bucket; for the last bucket that is the final point
+        following = points[end:min(int((i + 2) * every) + 1, n)]
+        avg_x = sum(p[0] for p in following) / len(following)
+        avg_y = sum(p[1] for p in following) / len(following)
+        best, best_area = points[start], -1.0
+        for p in points[start:end]:
+            area = abs((a[0] - avg_x) * (p[1] - a[1]) - (a[0] - p[0]) * (avg_y - a[1]))
+            if area > best_area:
+                best, best_area = p, area
+        sampled.append(best)
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+def parse_history_cursor(cursor):
+    """'<ts>:<id>' -> (ts, id); the page resumes strictly after that row."""
+    try:
+        ts, row_id = cursor.split(':')
+        return int(ts), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/attention-history", response_class=JSONResponse)
-async def attention_history(meeting_id: str = Query(...), user_email: str = Query(...)):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT timestamp, attention FROM attention_history WHERE meeting_id=? AND user_email=? ORDER BY timestamp ASC",
-        (meeting_id, user_email)
+async def attention_history(
+    meeting_id: str = Query(...),
+    user_email: str = Query(...),
+    bucket_seconds: Optional[int] = Query(None, ge=1),
+    max_points: Optional[int] = Query(None, ge=3),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_PAGE),
+    cursor: Optional[str] = Query(None),
+):
+    """Attention history for one user, oldest first.
+
+    ``bucket_seconds`` aggregates rows into fixed time buckets (mean as
+    ``attention`` plus ``min``, ``max`` and ``count``); whole-minute buckets
+    are read from the per-minute rollups. ``max_points``
+    downsamples the result with LTTB. ``limit`` pages the result; when more
+    rows follow, the ``X-Next-Cursor`` header holds the ``cursor`` value for
+    the next page.
+    """
+    after_ts, after_id = parse_history_cursor(cursor) if cursor else (-1, -1)
+    params = [meeting_id, user_email, after_ts, after_id]
+    if limit:
+        params.append(limit)
+    # Row-value comparison keeps ties on ts stable across pages
+    where = """FROM meetings m, users u
+           JOIN attention_history h ON h.meeting_id = m.id AND h.user_id = u.id
+           WHERE m.name=? AND u.email=? AND (h.ts, h.id) > (?, ?)"""
+    limit_sql = " LIMIT ?" if limit else ""
+    conn = get_db()
+    if bucket_seconds:
+        bucket_ms = bucket_seconds * 1000
+        if bucket_ms % MINUTE_MS == 0:
+            # Whole-minute buckets are summed from the rollup table. A rollup
+            # row compares like a history row with id 1, so a bucket cursor
+            # (start, 0) resumes at that bucket in both paths.
+            rows = conn.execute(
+                f"""SELECT (r.minute_ts / {bucket_ms}) * {bucket_ms} AS bucket,
+                          SUM(r.attention_sum) / SUM(r.attention_count),
+                          MIN(r.attention_min), MAX(r.attention_max), SUM(r.attention_count)
+                   FROM meetings m, users u
+                   JOIN attention_minutes r ON r.meeting_id = m.id AND r.user_id = u.id
+                   WHERE m.name=? AND u.email=? AND (r.minute_ts, 1) > (?, ?)
+                   GROUP BY bucket ORDER BY bucket ASC{limit_sql}""",
+                params
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"""SELECT (h.ts / {bucket_ms}) * {bucket_ms} AS bucket,
+                          AVG(h.attention), MIN(h.attention), MAX(h.attention), COUNT(*)
+                   {where}
+                   GROUP BY bucket ORDER BY bucket ASC{limit_sql}""",
+                params
+            ).fetchall()
+        points = [
+            (ts, mean, {"timestamp": format_epoch_ms(ts), "attention": mean,
+                        "min": low, "max": high, "count": count})
+            for ts, mean, low, high, count in rows
+        ]
+        # Ids are positive, so (next bucket start, 0) resumes at that bucket
+        next_cursor = f"{rows[-1][0] + bucket_ms}:0" if rows else None
+    else:
+        rows = conn.execute(
+            f"""SELECT h.ts, h.id, h.attention
+               {where}
+               ORDER BY h.ts ASC, h.id ASC{limit_sql}""",
+            params
+        ).fetchall()
+        points = [
+            (ts, att, {"timestamp": format_epoch_ms(ts), "attention": att})
+            for ts, _, att in rows
+        ]
+        next_cursor = f"{rows[-1][0]}:{rows[-1][1]}" if rows else None
+
+    if max_points:
+        points = lttb(points, max_points)
+    body = [point[2] for point in points]
+    if limit and len(rows) == limit:
+        return JSONResponse(content=body, headers={"X-Next-Cursor": next_cursor})
+    return body
+
+# --- Rollup reports ---
+def parse_range_ms(start, end):
+    """Optional ISO-8601 start/end -> epoch ms bounds (None when absent)."""
+    try:
+        return (to_epoch_ms(start) if start else None, to_epoch_ms(end) if end else None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO-8601 timestamps")
+
+def rollup_range_clauses(start, end):
+    """WHERE clauses and params bounding r.minute_ts to [start, end)."""
+    start_ms, end_ms = parse_range_ms(start, end)
+    clauses, params = [], []
+    if start_ms is not None:
+        # Keep the minute that contains start
+        clauses.append("r.minute_ts>=?")
+        params.append(start_ms // MINUTE_MS * MINUTE_MS)
+    if end_ms is not None:
+        clauses.append("r.minute_ts<?")
+        params.append(end_ms)
+    return clauses, params
+
+def rollup_summary(frames, total, low, high, first_minute, last_minute):
+    return {
+        "frames": frames,
+        "attention_percent": (total / frames * 100) if frames else 0.0,
+        "min_attention": low,
+        "max_attention": high,
+        "first_minute": format_epoch_ms(first_minute),
+        "last_minute": format_epoch_ms(last_minute),
+    }
+
+ROLLUP_AGGREGATES = """SUM(r.attention_count), SUM(r.attention_sum), MIN(r.attention_min),
+                      MAX(r.attention_max), MIN(r.minute_ts), MAX(r.minute_ts)"""
+
+@app.get("/api/meeting-summary", response_class=JSONResponse)
+async def meeting_summary(meeting_id: str = Query(...)):
+    """Per-user frame count, mean, min and max attention for one meeting."""
+    rows = get_db().execute(
+        f"""SELECT u.email, {ROLLUP_AGGREGATES}
+           FROM meetings m
+           JOIN attention_minutes r ON r.meeting_id = m.id
+           JOIN users u ON u.id = r.user_id
+           WHERE m.name=?
+           GROUP BY r.user_id
+           ORDER BY u.email""",
+        (meeting_id,)
+    ).fetchall()
+    return [{"user_email": row[0], **rollup_summary(*row[1:])} for row in rows]
+
+@app.get("/api/meeting-timeline", response_class=JSONResponse)
+async def meeting_timeline(
+    meeting_id: str = Query(...),
+    bucket_seconds: int = Query(60, ge=60, multiple_of=60),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+):
+    """Meeting-wide attention over time, aggregated across all users."""
+    bucket_ms = bucket_seconds * 1000
+    clauses, params = rollup_range_clauses(start, end)
+    rows = get_db().execute(
+        f"""SELECT (r.minute_ts / {bucket_ms}) * {bucket_ms} AS bucket,
+                  SUM(r.attention_sum) / SUM(r.attention_count),
+                  MIN(r.attention_min), MAX(r.attention_max),
+                  SUM(r.attention_count), COUNT(DISTINCT r.user_id)
+           FROM meetings m
+           JOIN attention_minutes r ON r.meeting_id = m.id
+           WHERE {' AND '.join(['m.name=?'] + clauses)}
+           GROUP BY bucket
+           ORDER BY bucket ASC""",
+        [meeting_id] + params
+    ).fetchall()
+    return [
+        {"timestamp": format_epoch_ms(ts), "attention": mean, "min": low, "max": high,
+         "count": count, "users": users}
+        for ts, mean, low, high, count, users in rows
+    ]
+
+@app.get("/api/attention-report", response_class=JSONResponse)
+async def attention_report(
+    user_email: Optional[str] = Query(None),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+):
+    """Attention per meeting and user across meetings, oldest meeting first."""
+    clauses, params = rollup_range_clauses(start, end)
+    if user_email is not None:
+        clauses.insert(0, "u.email=?")
+        params.insert(0, user_email)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = get_db().execute(
+        f"""SELECT m.name, u.email, {ROLLUP_AGGREGATES}
+           FROM attention_minutes r
+           JOIN meetings m ON m.id = r.meeting_id
+           JOIN users u ON u.id = r.user_id
+           {where}
+           GROUP BY r.meeting_id, r.user_id
+           ORDER BY MIN(r.minute_ts), m.name, u.email""",
+        params
+    ).fetchall()
+    return [
+        {"meeting_id": row[0], "user_email": row[1], **rollup_summary(*row[2:])}
+        for row in rows
+    ]
+
+# --- Export ---
+EXPORT_COLUMNS = {
+    "history": ["meeting_id", "user_email", "timestamp", "attention", "reused"],
+    "scores": ["meeting_id", "user_email", "date", "attention", "attention_sum", "attention_count", "updated_at"],
+}
+
+def export_query(table, meeting_id=None, start=None, end=None):
+    """SQL and parameters selecting the rows of one export.
+
+    ``start`` is inclusive and ``end`` exclusive. Score rows are daily, so a
+    day is included when any part of it falls inside the range.
+    """
+    clauses, params = [], []
+    if meeting_id is not None:
+        clauses.append("m.name=?")
+        params.append(meeting_id)
+    try:
+        start_dt = parse_timestamp(start) if start else None
+        end_dt = parse_timestamp(end) if end else None
+        if table == "history":
+            if start_dt:
+                clauses.append("h.ts>=?")
+                params.append(to_epoch_ms(start))
+            if end_dt:
+                clauses.append("h.ts<?")
+                params.append(to_epoch_ms(end))
+        else:
+            if start_dt:
+                clauses.append("s.date>=?")
+                params.append(start_dt.date().isoformat())
+            if end_dt:
+                # An end at midnight excludes that whole day
+                at_midnight = end_dt.time() == datetime.min.time()
+                clauses.append("s.date<?" if at_midnight else "s.date<=?")
+                params.append(end_dt.date().isoformat())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO-8601 timestamps")
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    if table == "history":
+        # Ordered like idx_history_meeting_user_ts, so no sort is needed
+        sql = f"""SELECT m.name, u.email, iso_ms(h.ts), h.attention, h.reused
+                  FROM meetings m
+                  JOIN attention_history h ON h.meeting_id = m.id
+                  JOIN users u ON u.id = h.user_id
+                  {where}
+                  ORDER BY h.meeting_id, h.user_id, h.ts"""
+    else:
+        sql = f"""SELECT m.name, u.email, s.date, s.attention, s.attention_sum, s.attention_count, s.updated_at
+                  FROM meetings m
+                  JOIN attention_scores s ON s.meeting_id = m.id
+                  JOIN users u ON u.id = s.user_id
+                  {where}
+                  ORDER BY s.meeting_id, s.user_id, s.date"""
+    return sql, params
+
+def iter_export(sql, params, columns, fmt, compress):
+    """Yield an export as encoded chunks of at most EXPORT_CHUNK_ROWS rows."""
+    # StreamingResponse advances sync generators on worker threads, so the
+    # export gets its own connection rather than a thread-local one.
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+    conn.create_function('iso_ms', 1, format_epoch_ms, deterministic=True)
+    # wbits=31 writes a gzip container, compressed chunk by chunk
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+
+    def drain(final=False):
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is not None:
+            data = compressor.compress(data)
+            if final:
+                data += compressor.flush()
+        return data
+
+    try:
+        if writer is not None:
+            writer.writerow(columns)
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row))))
+                    buffer.write('\n')
+            data = drain()
+            if data:
+                yield data
+        data = drain(final=True)
+        if data:
+            yield data
+    finally:
+        conn.close()
+
+def content_disposition(filename):
+    """Attachment header for a filename built from request input.
+
+    filename= gets an ASCII-only fallback, so quotes, CR/LF or non-ASCII
+    characters in a meeting id cannot break or inject into the header, and
+    filename* carries the exact name percent-encoded (RFC 5987).
+    """
+    fallback = re.sub(r'[^A-Za-z0-9._-]', '_', filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@app.get("/api/export")
+async def export_attention(
+    meeting_id: Optional[str] = Query(None),
+    table: str = Query("history", pattern="^(history|scores)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    gzip: bool = Query(False),
+):
+    """Stream attention_history or attention_scores rows as CSV or NDJSON."""
+    sql, params = export_query(table, meeting_id, start, end)
+    filename = f"attention-{table}{'-' + meeting_id if meeting_id else ''}.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        iter_export(sql, params, EXPORT_COLUMNS[table], format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(filename)},
     )
-    rows = c.fetchall()
-    conn.close()
-    return [{"timestamp": ts, "attention": att} for ts, att in rows]
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 3000))
-    uvicorn.run(app, host=HOST, port=port) 
\ No newline at end of file
+    if sys.argv[1:] == ["live-state-server"]:
+        logging.basicConfig(level=logging.INFO)
+        serve_live_state()
+    elif sys.argv[1:] == ["job-queue-server"]:
+        logging.basicConfig(level=logging.INFO)
+        serve_job_queue()
+    elif sys.argv[1:] == ["detection-worker"]:
+        logging.basicConfig(level=logging.INFO)
+        asyncio.run(run_detection_worker())
+    elif sys.argv[1:] == ["rebuild-rollups"]:
+        conn = get_db()
+        with conn:
+            count = rebuild_rollups(conn)
+        print(f"Rebuilt {count} per-minute rollup rows")
+    else:
+        import uvicorn
+        port = int(os.getenv("PORT", 3000))
+        uvicorn.run(app, host=HOST, port=port) 
\ No newline at end of file